@@ -2,14 +2,18 @@
 
 const int rainSensorPin = 7;
 const int servoPin = 8;
+const int rainAnalogPin = A0;  // Optional analog output of the rain sensor
 Servo myServo;
 
 bool manualMode = false;
 bool coverState = false;
 bool lastRainState = false;
 unsigned long rainStopTime = 0;
-const unsigned long RAIN_STOP_DELAY = 5000;  // 5 second delay only when rain stops
+unsigned long rainStopDelay = 5000;  // Delay before reopening when rain stops; DELAY <seconds> changes it
 bool waitingForRainStop = false;
+bool streamIntensity = false;  // Enabled by the STREAM ON command
+unsigned long lastIntensitySample = 0;
+const unsigned long INTENSITY_INTERVAL = 100;  // 10 Hz
 
 void setup() {
   pinMode(rainSensorPin, INPUT);
@@ -36,6 +40,7 @@ void loop() {
   // Rain detection always active (even in manual mode) to protect clothes
   // In manual mode, it only closes on rain, doesn't auto-open when rain stops
   checkRainWithDelay();
+  sendIntensitySample();
   
   delay(100);
 }
@@ -64,12 +69,12 @@ void checkRainWithDelay() {
       // Rain just stopped
       waitingForRainStop = true;
       rainStopTime = currentTime;
-      Serial.println("NOTIFICATION:Rain stopped! Confirming in 5 seconds...");
+      Serial.println("NOTIFICATION:Rain stopped! Confirming in " + String(rainStopDelay / 1000) + " seconds...");
     }
     
     // Check if delay period has passed after rain stopped
     if (waitingForRainStop && !currentRainState) {
-      if (currentTime - rainStopTime >= RAIN_STOP_DELAY) {
+      if (currentTime - rainStopTime >= rainStopDelay) {
         // Delay period passed, open the cover
         if (coverState) {
           myServo.write(0);
@@ -89,6 +94,17 @@ void checkRainWithDelay() {
   lastRainState = currentRainState;
 }
 
+void sendIntensitySample() {
+  if (!streamIntensity || millis() - lastIntensitySample < INTENSITY_INTERVAL) {
+    return;
+  }
+  lastIntensitySample = millis();
+  // Sensor output drops as it gets wetter - invert so higher means more rain.
+  // Compact "I:<0-1023>" lines keep 10 Hz under 100 bytes/s at 9600 baud.
+  Serial.print("I:");
+  Serial.println(1023 - analogRead(rainAnalogPin));
+}
+
 void processCommand(String command) {
   command.toUpperCase();
   
@@ -117,6 +133,29 @@ void processCommand(String command) {
     Serial.println("NOTIFICATION:AUTO_MODE - Rain detection active");
     Serial.println("STATUS:Operation Mode:AUTO");
   }
+  else if (command == "PING") {
+    // Heartbeat from the host - keep the reply tiny to spare the 9600 baud link
+    Serial.println("PONG");
+  }
+  else if (command == "STREAM ON") {
+    streamIntensity = true;
+    Serial.println("SYSTEM:Rain intensity streaming on");
+  }
+  else if (command == "STREAM OFF") {
+    streamIntensity = false;
+    Serial.println("SYSTEM:Rain intensity streaming off");
+  }
+  else if (command.startsWith("DELAY ")) {
+    // Reopen delay after rain stops, e.g. DELAY 1800 keeps the cover closed
+    // for 30 minutes of dry weather while staying in AUTO mode
+    long seconds = command.substring(6).toInt();
+    if (seconds < 1) {
+      Serial.println("ERROR:Invalid delay: " + command);
+    } else {
+      rainStopDelay = (unsigned long)seconds * 1000UL;
+      Serial.println("STATUS:Confirmation Delay:" + String(seconds) + " seconds (rain stop only)");
+    }
+  }
   else if (command == "STATUS") {
     Serial.println("STATUS:Arduino Connection:Connected");
     Serial.println("STATUS:Operation Mode:" + String(manualMode ? "MANUAL" : "AUTO"));
@@ -124,7 +163,7 @@ void processCommand(String command) {
     
     bool currentRain = (digitalRead(rainSensorPin) == LOW);
     Serial.println("STATUS:Rain Detection:" + String(currentRain ? "RAINING" : "DRY"));
-    Serial.println("STATUS:Confirmation Delay:5 seconds (rain stop only)");
+    Serial.println("STATUS:Confirmation Delay:" + String(rainStopDelay / 1000) + " seconds (rain stop only)");
   }
   else {
     Serial.println("ERROR:Unknown command: " + command);
@@ -2,6 +2,7 @@ import serial
 import time
 import threading
 from datetime import datetime, timedelta
+from metrics import ControllerMetrics
 
 class ArduinoConnection:
     """
@@ -10,10 +11,35 @@ class ArduinoConnection:
     Note: Arduino behavior:
     - Rain detected: Cover closes immediately (no delay)
     - Rain stopped: Cover opens after 5 second delay
+    
+    If a ScheduleStore is given, schedules survive restarts and are
+    restored (with catch-up for missed actions) on connect.
+    
+    Link health: a PING is sent every heartbeat_interval seconds and the
+    sketch answers PONG. The link is DEGRADED after one missed beat and
+    DOWN after max_missed_beats, i.e. within
+    heartbeat_interval * max_missed_beats seconds of the board going quiet.
+    Older sketches that answer "ERROR:Unknown command: PING" get the
+    heartbeat turned off instead.
     """
-    def __init__(self, port='COM8', baudrate=9600):
+    def __init__(self, port='COM8', baudrate=9600, schedule_store=None,
+                 heartbeat_interval=2.0, max_missed_beats=3):
         self.port = port
         self.baudrate = baudrate
+        self.schedule_store = schedule_store
+        self.heartbeat_interval = heartbeat_interval
+        self.max_missed_beats = max_missed_beats
+        self.heartbeat_thread = None
+        self.heartbeat_supported = True
+        self.link_state = "DOWN"
+        self.missed_beats = 0
+        self.last_rtt = None
+        self.rtt_jitter = 0.0
+        self._ping_sent_at = None
+        self._last_rx = 0.0
+        self._rx_buffer = b""
+        self.metrics = ControllerMetrics(port)
+        self.intensity_buffer = None
         self.arduino = None
         self.running = False
         self.serial_thread = None
@@ -21,19 +47,39 @@ class ArduinoConnection:
         self.scheduled_open_time = None
         self.scheduled_close_time = None
         self.schedule_active = False
+        self.capture_file = None
+        self._capture_start = None
+        self._capture_lock = threading.Lock()
+        self._write_lock = threading.Lock()
         
     def add_message_handler(self, handler):
         """Add a function to handle incoming messages"""
         self.message_handlers.append(handler)
         
-    def connect(self):
-        """Connect to Arduino"""
+    def connect(self, background=True):
+        """
+        Connect to Arduino.
+        
+        With background=False no reader or heartbeat thread is started; the
+        caller drives read_available() and heartbeat_tick() itself (used by
+        fleet workers to serve many ports from one thread).
+        """
         try:
             self.arduino = serial.Serial(self.port, self.baudrate, timeout=1)
             time.sleep(2)  # Wait for Arduino reset
             self.running = True
+            self._rx_buffer = b""
+            self.link_state = "UP"
+            self.missed_beats = 0
+            self.metrics.link_up.set(1)
+            self.restore_schedule()
             self._notify_handlers("SYSTEM", "✅ Connected to Arduino successfully!")
-            self._start_serial_reader()
+            if background:
+                self._start_serial_reader()
+                self._start_heartbeat()
+            else:
+                self._ping_sent_at = None
+                self.heartbeat_supported = True
             return True
         except Exception as e:
             self._notify_handlers("ERROR", f"❌ Connection failed: {e}")
@@ -42,6 +88,9 @@ class ArduinoConnection:
     def disconnect(self):
         """Disconnect from Arduino"""
         self.running = False
+        self.link_state = "DOWN"
+        self.metrics.link_up.set(0)
+        self.stop_capture()
         if self.arduino and self.arduino.is_open:
             self.arduino.close()
         self._notify_handlers("SYSTEM", "Disconnected from Arduino")
@@ -50,7 +99,7 @@ class ArduinoConnection:
         """Send command to Arduino"""
         if self.arduino and self.arduino.is_open:
             try:
-                self.arduino.write(f"{command}\n".encode())
+                self._write_line(command)
                 self._notify_handlers("COMMAND", f"📡 Sent: {command}")
                 return True
             except Exception as e:
@@ -58,35 +107,264 @@ class ArduinoConnection:
                 return False
         return False
     
+    def send_priority_command(self, command):
+        """
+        Send a time-critical command ahead of any other work.
+        
+        The command is written and flushed to the port before handlers are
+        notified, so GUI work in the handlers can't delay it.
+        
+        Returns the time.perf_counter() value when the write completed,
+        or None if it could not be sent.
+        """
+        if not (self.arduino and self.arduino.is_open):
+            return None
+        try:
+            self._write_line(command, flush=True)
+            sent_at = time.perf_counter()
+        except Exception as e:
+            self._notify_handlers("ERROR", f"Send failed: {e}")
+            return None
+        self._notify_handlers("COMMAND", f"⚡ Sent (priority): {command}")
+        return sent_at
+    
+    def _write_line(self, command, flush=False):
+        """Write one command line to the port (serialized across threads)"""
+        with self._write_lock:
+            self.arduino.write(f"{command}\n".encode())
+            if flush:
+                self.arduino.flush()
+        self.metrics.command_sent(command)
+    
     def _start_serial_reader(self):
         """Start background thread for reading serial data"""
         def read_serial():
             while self.running:
                 if self.arduino and self.arduino.in_waiting > 0:
                     try:
-                        message = self.arduino.readline().decode().strip()
-                        if message:
-                            self._process_arduino_message(message)
+                        self.read_available()
                     except Exception as e:
-                        self._notify_handlers("ERROR", f"Serial read error: {e}")
-                time.sleep(0.1)
+                        self.read_failed(e)
+                        time.sleep(0.1)
+                else:
+                    time.sleep(0.1)  # Only idle when there is nothing to read
         
         self.serial_thread = threading.Thread(target=read_serial, daemon=True)
         self.serial_thread.start()
     
+    def read_available(self):
+        """
+        Read whatever is waiting on the port without blocking and process
+        every complete line. Call only when the port has data (or is
+        reported readable). Returns the number of lines processed.
+        """
+        data = self.arduino.read(max(self.arduino.in_waiting, 1))
+        if not data:
+            return 0
+        self._last_rx = time.perf_counter()
+        *lines, self._rx_buffer = (self._rx_buffer + data).split(b"\n")
+        count = 0
+        for line in lines:
+            try:
+                message = line.decode().strip()
+            except UnicodeDecodeError as e:
+                self.read_failed(e)
+                continue
+            if message:
+                count += 1
+                self.metrics.lines_read.inc()
+                if self.capture_file:
+                    self._capture_line(message)
+                self._process_arduino_message(message)
+        return count
+    
+    def read_failed(self, error):
+        """Count and report a serial read failure"""
+        self.metrics.read_errors.inc()
+        self._notify_handlers("ERROR", f"Serial read error: {error}")
+    
+    def _start_heartbeat(self):
+        """Start background thread that pings the Arduino"""
+        if not self.heartbeat_interval:
+            return
+        
+        def heartbeat():
+            while self.running:
+                time.sleep(self.heartbeat_interval)
+                if not self.running or not self.heartbeat_supported:
+                    break
+                self.heartbeat_tick()
+        
+        self._ping_sent_at = None
+        self.heartbeat_supported = True
+        self.heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        self.heartbeat_thread.start()
+    
+    def heartbeat_tick(self):
+        """Count a missed beat if the last PING went unanswered, then send the next PING"""
+        if not (self.running and self.heartbeat_supported):
+            return
+        
+        # A beat is missed if nothing at all came back since the last PING
+        if self._ping_sent_at is not None and self._last_rx < self._ping_sent_at:
+            self.missed_beats += 1
+            self._update_link_state()
+        
+        try:
+            # Stamp before writing, so a fast PONG always finds it
+            self._ping_sent_at = time.perf_counter()
+            self._write_line("PING")
+        except Exception as e:
+            self.missed_beats = self.max_missed_beats
+            self._update_link_state(f"write failed: {e}")
+    
+    def _handle_pong(self):
+        """Measure round-trip time and jitter from a PONG reply"""
+        if self._ping_sent_at is None:
+            return
+        rtt = time.perf_counter() - self._ping_sent_at
+        self._ping_sent_at = None
+        if self.last_rtt is not None:
+            # Smoothed jitter estimate, as in RFC 3550
+            self.rtt_jitter += (abs(rtt - self.last_rtt) - self.rtt_jitter) / 16
+        self.last_rtt = rtt
+        self.missed_beats = 0
+        self._update_link_state()
+    
+    def _disable_heartbeat(self):
+        """Stop pinging a sketch that does not know PING"""
+        if not self.heartbeat_supported:
+            return
+        self.heartbeat_supported = False
+        self._ping_sent_at = None
+        self.missed_beats = 0
+        self._update_link_state()
+        self._notify_handlers("SYSTEM", 
+            "Sketch does not support heartbeats - upload the latest sketch for dead-link detection")
+    
+    def _update_link_state(self, reason=None):
+        """Derive the link state from missed beats and notify on change"""
+        if self.missed_beats == 0:
+            state = "UP"
+        elif self.missed_beats < self.max_missed_beats:
+            state = "DEGRADED"
+        else:
+            state = "DOWN"
+        if state == self.link_state:
+            return
+        self.link_state = state
+        self.metrics.link_up.set(1 if state == "UP" else 0)
+        
+        if state == "UP":
+            detail = f"rtt {self.last_rtt * 1000:.0f} ms" if self.last_rtt is not None else "responding"
+        elif state == "DEGRADED":
+            detail = f"{self.missed_beats} missed heartbeat(s)"
+        else:
+            detail = reason or f"no response for {self.missed_beats * self.heartbeat_interval:.0f}s"
+        self._notify_handlers("LINK", f"Link {state} - {detail}")
+    
+    def get_link_health(self):
+        """Get heartbeat statistics for the serial link"""
+        return {
+            'state': self.link_state,
+            'missed_beats': self.missed_beats,
+            'rtt_ms': self.last_rtt * 1000 if self.last_rtt is not None else None,
+            'jitter_ms': self.rtt_jitter * 1000,
+        }
+    
+    def enable_intensity_stream(self, capacity=6 * 3600 * 10):
+        """
+        Ask the sketch to stream analog rain intensity at 10 Hz and keep the
+        samples in a RainIntensityBuffer (default: 6 hours). Needs NumPy.
+        """
+        if self.intensity_buffer is None:
+            try:
+                from rain_buffer import RainIntensityBuffer
+            except ImportError as e:
+                self._notify_handlers("ERROR", f"Intensity streaming unavailable: {e}")
+                return False
+            self.intensity_buffer = RainIntensityBuffer(capacity)
+        return self.send_command("STREAM ON")
+    
+    def disable_intensity_stream(self):
+        """Stop the sketch streaming intensity samples (buffer is kept)"""
+        return self.send_command("STREAM OFF")
+    
+    def _handle_intensity(self, message):
+        """Store an "I:<value>" sample without notifying handlers"""
+        if self.intensity_buffer is None:
+            return
+        try:
+            value = int(message[2:])
+        except ValueError:
+            self.metrics.parse_errors.inc()
+            return
+        # Monotonic, so a wall-clock step can't reorder the chart's time index
+        self.intensity_buffer.append(time.monotonic(), value)
+    
+    def start_capture(self, path):
+        """
+        Record every raw line read from the Arduino to a capture file.
+        
+        Each line is written as "<seconds>\\t<raw line>", where seconds is a
+        monotonic offset from the start of the capture. Use serial_replay.py
+        to feed a capture back through the message pipeline.
+        """
+        with self._capture_lock:
+            if self.capture_file:
+                self.capture_file.close()
+            self.capture_file = open(path, 'w', encoding='utf-8', newline='\n', buffering=1)
+            self._capture_start = time.monotonic()
+        self._notify_handlers("SYSTEM", f"⏺️ Capturing serial traffic to {path}")
+        return True
+    
+    def stop_capture(self):
+        """Stop recording raw serial lines"""
+        with self._capture_lock:
+            if not self.capture_file:
+                return False
+            self.capture_file.close()
+            self.capture_file = None
+            self._capture_start = None
+        self._notify_handlers("SYSTEM", "⏹️ Serial capture stopped")
+        return True
+    
+    def _capture_line(self, message):
+        """Append one raw line to the active capture file"""
+        with self._capture_lock:
+            if self.capture_file:
+                offset = time.monotonic() - self._capture_start
+                self.capture_file.write(f"{offset:.3f}\t{message}\n")
+    
     def _process_arduino_message(self, message):
         """Process incoming messages from Arduino"""
-        if message.startswith("NOTIFICATION:"):
+        if message.startswith("I:"):
+            self._handle_intensity(message)
+        elif message == "PONG":
+            self._handle_pong()
+        elif message == "ERROR:Unknown command: PING":
+            self._disable_heartbeat()
+        elif message.startswith("NOTIFICATION:"):
             self._notify_handlers("ARDUINO", message[13:])
         elif message.startswith("STATUS:"):
-            self._notify_handlers("STATUS", message[7:])
+            status = message[7:]
+            if status.startswith("Cover Status:"):
+                self.metrics.set_cover_state(status.endswith("CLOSED"))
+            elif status.startswith("Rain Detection:"):
+                self.metrics.raining.set(1 if status.endswith("RAINING") else 0)
+            self._notify_handlers("STATUS", status)
         elif message.startswith("SYSTEM:"):
             self._notify_handlers("SYSTEM", message[7:])
         elif message.startswith("ERROR:"):
             self._notify_handlers("ERROR", message[6:])
         else:
+            self.metrics.parse_errors.inc()
             self._notify_handlers("INFO", message)
     
+    def notify(self, message_type, message):
+        """Send a message to all handlers (for components built on this connection, e.g. rules)"""
+        self._notify_handlers(message_type, message)
+    
     def _notify_handlers(self, message_type, message):
         """Notify all registered message handlers"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -96,16 +374,21 @@ class ArduinoConnection:
             try:
                 handler(message_type, formatted_message, message)
             except Exception as e:
+                self.metrics.handler_exceptions.inc()
                 print(f"Handler error: {e}")
     
     def is_connected(self):
-        """Check if Arduino is connected"""
-        return self.arduino and self.arduino.is_open
+        """Check if Arduino is connected and answering heartbeats"""
+        return self.arduino and self.arduino.is_open and self.link_state != "DOWN"
     
     def manual_close_cover(self):
         """Send close cover command"""
         return self.send_command("CLOSE")
     
+    def emergency_close_cover(self):
+        """Send close cover command on the priority path"""
+        return self.send_priority_command("CLOSE")
+    
     def manual_open_cover(self):
         """Send open cover command"""
         return self.send_command("OPEN")
@@ -136,6 +419,8 @@ class ArduinoConnection:
         self._schedule_opened = False  # Reset flags for new schedule
         self._schedule_closed = False
         
+        self._store_schedule('save', open_time, self.scheduled_close_time)
+        
         open_str = open_time.strftime("%H:%M:%S")
         close_str = self.scheduled_close_time.strftime("%H:%M:%S")
         
@@ -153,10 +438,64 @@ class ArduinoConnection:
                 delattr(self, '_schedule_opened')
             if hasattr(self, '_schedule_closed'):
                 delattr(self, '_schedule_closed')
+            self._store_schedule('delete')
             self._notify_handlers("SYSTEM", "📅 Schedule cancelled")
             return True
         return False
     
+    def restore_schedule(self):
+        """
+        Reload a persisted schedule after a restart.
+        
+        Catch-up policy for actions missed while the app was down:
+        - Close time already passed: skip the missed open and close now
+        - Open time passed but close time not: open now, close on time
+        - Both in the future: schedule runs normally
+        """
+        if not self.schedule_store:
+            return False
+        try:
+            stored = self.schedule_store.load(self.port)
+        except Exception as e:
+            self._notify_handlers("ERROR", f"Schedule restore failed: {e}")
+            return False
+        if not stored:
+            return False
+        
+        now = datetime.now()
+        self.scheduled_open_time = stored['open_time']
+        self.scheduled_close_time = stored['close_time']
+        self.schedule_active = True
+        self._schedule_opened = stored['opened'] or now >= self.scheduled_close_time
+        self._schedule_closed = False
+        
+        open_str = self.scheduled_open_time.strftime("%H:%M:%S")
+        close_str = self.scheduled_close_time.strftime("%H:%M:%S")
+        if now >= self.scheduled_close_time:
+            self.metrics.schedule_misses.inc()
+            self._notify_handlers("SYSTEM", 
+                f"📅 Schedule restored: close time {close_str} was missed, closing now")
+        elif now >= self.scheduled_open_time and not stored['opened']:
+            self.metrics.schedule_misses.inc()
+            self._notify_handlers("SYSTEM", 
+                f"📅 Schedule restored: open time {open_str} was missed, opening now")
+        else:
+            self._notify_handlers("SYSTEM", 
+                f"📅 Schedule restored: Open at {open_str}, Close at {close_str}")
+        return True
+    
+    def _store_schedule(self, operation, *args):
+        """Apply a schedule change to the persistent store, if configured"""
+        if not self.schedule_store:
+            return
+        try:
+            if operation == 'save':
+                self.schedule_store.save(self.port, *args)
+            else:
+                getattr(self.schedule_store, operation)(self.port)
+        except Exception as e:
+            self._notify_handlers("ERROR", f"Schedule not saved: {e}")
+    
     def get_schedule_info(self):
         """Get current schedule information"""
         if self.schedule_active and self.scheduled_open_time:
@@ -182,6 +521,8 @@ class ArduinoConnection:
             if not hasattr(self, '_schedule_opened') or not self._schedule_opened:
                 if self.manual_open_cover():
                     self._schedule_opened = True
+                    self._store_schedule('mark_opened')
+                    self.metrics.schedule_fires.inc()
                     action = "OPENED"
                     self._notify_handlers("SYSTEM", 
                         f"⏰ Scheduled open executed at {now.strftime('%H:%M:%S')}")
@@ -194,6 +535,8 @@ class ArduinoConnection:
                     self._schedule_closed = True
                     action = "CLOSED"
                     self.schedule_active = False  # Schedule completed
+                    self._store_schedule('delete')
+                    self.metrics.schedule_fires.inc()
                     self._notify_handlers("SYSTEM", 
                         f"⏰ Scheduled close executed at {now.strftime('%H:%M:%S')}")
         
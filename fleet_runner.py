@@ -0,0 +1,370 @@
+import os
+import sys
+import time
+import queue
+import threading
+import argparse
+import selectors
+import itertools
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from arduino_connection import ArduinoConnection
+from schedule_store import ScheduleStore
+
+# Backend methods a coordinator may invoke inside a worker
+FLEET_METHODS = {
+    'send_command',
+    'manual_close_cover',
+    'manual_open_cover',
+    'set_auto_mode',
+    'get_status',
+    'set_schedule',
+    'cancel_schedule',
+}
+
+
+def _worker_main(worker_id, ports, baudrate, command_queue, event_conn, schedule_db=None):
+    """
+    Worker process entry point.
+
+    Owns the serial I/O and schedule checks for its shard of ports and
+    reports every message to the coordinator as a (port, type, raw) tuple
+    over its own pipe. Each command is acknowledged with (None, "ACK", seq)
+    once it has run. Only one sender thread writes to the pipe, so the
+    serial reads never block on the coordinator.
+
+    However many ports it has, a worker runs three threads: this one for
+    commands, one serving all ports (_serve_ports) and the event sender.
+    """
+    event_queue = queue.Queue()
+
+    def send_events():
+        while True:
+            event = event_queue.get()
+            if event is None:
+                break
+            try:
+                event_conn.send(event)
+            except OSError:
+                break
+
+    sender = threading.Thread(target=send_events, daemon=True)
+    sender.start()
+
+    schedule_store = ScheduleStore(schedule_db) if schedule_db else None
+    backends = {}
+    for port in ports:
+        backend = ArduinoConnection(port=port, baudrate=baudrate, schedule_store=schedule_store)
+        backend.add_message_handler(
+            lambda message_type, formatted_message, raw_message, port=port:
+                event_queue.put((port, message_type, raw_message)))
+        backends[port] = backend
+
+    # Connect in parallel - each connect() waits 2 seconds for the board reset.
+    # These threads are short-lived; reading and heartbeats run in _serve_ports.
+    connectors = [threading.Thread(target=b.connect, kwargs={'background': False}, daemon=True)
+                  for b in backends.values()]
+    for t in connectors:
+        t.start()
+    for t in connectors:
+        t.join()
+
+    stop = threading.Event()
+    server = threading.Thread(target=_serve_ports,
+                              args=(list(backends.values()), event_queue, stop), daemon=True)
+    server.start()
+    try:
+        while True:
+            item = command_queue.get()
+            if item is None:
+                break
+            seq, port, method, args = item
+            targets = backends.values() if port is None else [backends[port]]
+            for backend in targets:
+                try:
+                    getattr(backend, method)(*args)
+                except Exception as e:
+                    event_queue.put((backend.port, "ERROR", f"{method} failed: {e}"))
+            event_queue.put((None, "ACK", seq))
+    finally:
+        stop.set()
+        server.join(2)
+        for backend in backends.values():
+            backend.disconnect()
+        if schedule_store:
+            schedule_store.close()
+        event_queue.put(None)
+        sender.join(1)
+        event_conn.close()
+
+
+def _serve_ports(backends, event_queue, stop):
+    """
+    Read every port of a worker from one thread, and send one heartbeat and
+    schedule tick across all of them.
+
+    Waits on the ports' file descriptors with a selector where pyserial
+    exposes them (POSIX); otherwise (Windows) polls in_waiting every 50 ms.
+    """
+    live = [b for b in backends if b.running]
+    selector = None
+    if live and all(hasattr(b.arduino, 'fileno') for b in live):
+        selector = selectors.DefaultSelector()
+        for backend in live:
+            selector.register(backend.arduino.fileno(), selectors.EVENT_READ, backend)
+
+    interval = min((b.heartbeat_interval for b in live if b.heartbeat_interval), default=None)
+    next_beat = time.monotonic() + interval if interval else float('inf')
+    next_schedule_check = time.monotonic()
+    try:
+        while not stop.is_set():
+            timeout = max(0.0, min(next_beat, next_schedule_check, time.monotonic() + 0.5)
+                          - time.monotonic())
+            if selector and live:
+                ready = [key.data for key, _ in selector.select(timeout)]
+            else:
+                ready = [b for b in live if b.arduino.in_waiting > 0]
+                if not ready:
+                    stop.wait(min(timeout, 0.05))
+
+            for backend in ready:
+                try:
+                    backend.read_available()
+                except Exception as e:
+                    # A port that fails stays readable; stop serving it rather than spin
+                    backend.read_failed(e)
+                    live.remove(backend)
+                    if selector:
+                        selector.unregister(backend.arduino.fileno())
+
+            now = time.monotonic()
+            if now >= next_beat:
+                for backend in live:
+                    backend.heartbeat_tick()
+                next_beat = now + interval
+            if now >= next_schedule_check:
+                for backend in backends:
+                    try:
+                        backend.check_schedule()
+                    except Exception as e:
+                        event_queue.put((backend.port, "ERROR", f"Schedule checker error: {e}"))
+                next_schedule_check = now + 1
+    finally:
+        if selector:
+            selector.close()
+
+
+class FleetRunner:
+    """
+    Runs many covers by sharding their ports across worker processes.
+
+    Each worker owns its ports' serial I/O and scheduling, so the GIL is
+    split across processes, and serves all its ports from one thread, so
+    the thread count per worker stays constant as ports are added. Each worker reports over
+    its own pipe, so a worker killed mid-send can only corrupt its own
+    channel. The coordinator merges the per-device state from all pipes,
+    fans fleet-wide commands out to all workers at once, and restarts any
+    worker that dies (with a fresh pipe) without touching the others.
+    Commands a worker had not acknowledged when it died are replayed once
+    into its replacement, so a close_all() sent around a crash still
+    reaches that shard's covers. With
+    a schedule_db, all workers share one ScheduleStore database so schedules
+    survive worker restarts.
+    """
+    RESTART_BACKOFF = 5  # Minimum seconds between restarts of one worker
+
+    def __init__(self, ports, workers=None, baudrate=9600, schedule_db=None):
+        self.baudrate = baudrate
+        self.schedule_db = schedule_db
+        workers = max(1, min(workers or os.cpu_count() or 1, len(ports)))
+        self.shards = [list(ports[i::workers]) for i in range(workers)]
+        self.port_worker = {port: i for i, shard in enumerate(self.shards) for port in shard}
+        self.ctx = mp.get_context('spawn')
+        self.workers = [None] * workers
+        self.command_queues = [None] * workers
+        self.event_conns = [None] * workers
+        self.unacked = [{} for _ in range(workers)]  # seq -> [command, replayed]
+        self._command_seq = itertools.count(1)
+        self._command_lock = threading.Lock()
+        self.last_restart = [0.0] * workers
+        self.state = {port: {} for port in ports}
+        self.message_handlers = []
+        self.running = False
+        self.monitor_thread = None
+
+    def add_message_handler(self, handler):
+        """Add a function called as handler(port, message_type, raw_message)"""
+        self.message_handlers.append(handler)
+
+    def start(self):
+        """Start all workers and the coordinator monitor thread"""
+        self.running = True
+        for i in range(len(self.shards)):
+            self._start_worker(i)
+        self.monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+        self.monitor_thread.start()
+
+    def stop(self, timeout=5):
+        """Ask all workers to disconnect and exit"""
+        self.running = False
+        for command_queue in self.command_queues:
+            command_queue.put(None)
+        for process in self.workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def _start_worker(self, index):
+        """Start (or restart) the worker for one shard"""
+        if self.event_conns[index] is not None:
+            self.event_conns[index].close()
+        with self._command_lock:
+            self.command_queues[index] = self.ctx.Queue()
+            self._replay_unacked(index)
+        event_conn, worker_conn = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(index, self.shards[index], self.baudrate,
+                  self.command_queues[index], worker_conn, self.schedule_db),
+            name=f"fleet-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        worker_conn.close()  # Only the worker holds the send end, so its exit reads as EOF
+        self.event_conns[index] = event_conn
+        self.workers[index] = process
+        self.last_restart[index] = time.monotonic()
+
+    def _replay_unacked(self, index):
+        """Queue commands the previous worker never ran (caller holds _command_lock)"""
+        for seq, entry in list(self.unacked[index].items()):
+            command, replayed = entry
+            if replayed:
+                # Already replayed once; the command may be what kills the worker
+                del self.unacked[index][seq]
+                self._handle_event(command[1], "ERROR",
+                    f"Dropped {command[2]} for worker {index}: not run after a restart")
+                continue
+            entry[1] = True
+            self.command_queues[index].put(command)
+            self._handle_event(command[1], "SYSTEM",
+                f"Replaying {command[2]} to restarted worker {index}")
+
+    def _send_to_worker(self, index, port, method, args):
+        """Queue a command for a worker and remember it until acknowledged"""
+        with self._command_lock:
+            command = (next(self._command_seq), port, method, args)
+            self.unacked[index][command[0]] = [command, False]
+            self.command_queues[index].put(command)
+
+    def _monitor(self):
+        """Drain worker events and restart crashed workers"""
+        while self.running:
+            conns = [conn for conn in self.event_conns if conn is not None]
+            if conns:
+                ready = wait(conns, timeout=0.5)
+            else:
+                ready = []
+                time.sleep(0.5)
+            for conn in ready:
+                index = self.event_conns.index(conn)
+                try:
+                    while conn.poll():
+                        port, message_type, raw_message = conn.recv()
+                        if message_type == "ACK":
+                            with self._command_lock:
+                                self.unacked[index].pop(raw_message, None)
+                        else:
+                            self._handle_event(port, message_type, raw_message)
+                except Exception:
+                    # Worker exited, possibly mid-send; only its own pipe is affected
+                    conn.close()
+                    self.event_conns[index] = None
+
+            now = time.monotonic()
+            for i, process in enumerate(self.workers):
+                if self.running and not process.is_alive() \
+                        and now - self.last_restart[i] >= self.RESTART_BACKOFF:
+                    self._handle_event(None, "ERROR",
+                        f"Worker {i} exited with code {process.exitcode}, restarting")
+                    self._start_worker(i)
+
+    def _handle_event(self, port, message_type, raw_message):
+        """Merge a worker event into the fleet state and notify handlers"""
+        if message_type == "STATUS" and ":" in raw_message:
+            field, value = raw_message.split(":", 1)
+            self.state[port][field.strip()] = value.strip()
+
+        for handler in self.message_handlers:
+            try:
+                handler(port, message_type, raw_message)
+            except Exception as e:
+                print(f"Handler error: {e}")
+
+    def call(self, port, method, *args):
+        """Invoke a backend method for one port inside its worker"""
+        if method not in FLEET_METHODS:
+            raise ValueError(f"Unsupported fleet method: {method}")
+        self._send_to_worker(self.port_worker[port], port, method, args)
+
+    def broadcast(self, method, *args):
+        """Invoke a backend method on every device, all workers in parallel"""
+        if method not in FLEET_METHODS:
+            raise ValueError(f"Unsupported fleet method: {method}")
+        for index in range(len(self.command_queues)):
+            self._send_to_worker(index, None, method, args)
+
+    def send_command(self, port, command):
+        """Send a raw command to one device"""
+        self.call(port, 'send_command', command)
+
+    def close_all(self):
+        """Close every cover in the fleet"""
+        self.broadcast('manual_close_cover')
+
+    def open_all(self):
+        """Open every cover in the fleet"""
+        self.broadcast('manual_open_cover')
+
+    def get_state(self, port=None):
+        """Get the last reported status fields for one port or the whole fleet"""
+        if port is not None:
+            return dict(self.state[port])
+        return {p: dict(fields) for p, fields in self.state.items()}
+
+
+def main():
+    """Run a fleet from the command line; stdin lines are sent as commands"""
+    parser = argparse.ArgumentParser(description="Run many Smart Clothes Protectors")
+    parser.add_argument("ports", nargs="+", help="serial ports, e.g. COM3 COM4 /dev/ttyACM0")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--schedule-db", default=None,
+                        help="SQLite file for persistent schedules (default: not persisted)")
+    args = parser.parse_args()
+
+    fleet = FleetRunner(args.ports, workers=args.workers, baudrate=args.baudrate,
+                        schedule_db=args.schedule_db)
+    fleet.add_message_handler(
+        lambda port, message_type, raw_message: print(f"{port or 'fleet'}: {message_type:8} {raw_message}"))
+    fleet.start()
+    print(f"Fleet started: {len(args.ports)} devices on {len(fleet.shards)} workers")
+    print("Type a command (CLOSE, OPEN, AUTO, STATUS) for all devices, or '<port> <command>'")
+
+    try:
+        for line in sys.stdin:
+            parts = line.split()
+            if len(parts) == 1:
+                fleet.broadcast('send_command', parts[0].upper())
+            elif len(parts) == 2 and parts[0] in fleet.port_worker:
+                fleet.send_command(parts[0], parts[1].upper())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
+from collections import deque
 from datetime import datetime, timedelta
+from status_view_model import StatusViewModel, status_color
 
 # Color Scheme - Modern and Accessible
 COLORS = {
@@ -29,12 +32,25 @@ FONTS = {
     'mono': ('Consolas', 10),
 }
 
+EMERGENCY_ARM_MS = 3000       # How long the armed close button waits for the second click
+CLOSE_CONFIRM_TIMEOUT_MS = 3000  # How long to wait for the board to confirm a close
+CHART_REFRESH_MS = 500           # Rain intensity chart redraw interval
+CHART_SPANS = [("1 min", 60), ("10 min", 600), ("1 hour", 3600), ("6 hours", 21600)]
+
 class GUIInterface:
     def __init__(self, root, backend):
         self.root = root
         self.backend = backend
+        self._close_armed = False
+        self._disarm_job = None
+        self._pending_close = None
+        self._pending_close_previous = None
+        self.close_latencies = deque(maxlen=100)
         self.setup_gui()
         
+        # Emergency close shortcut works from anywhere in the app
+        self.root.bind_all("<Control-Shift-C>", self.emergency_close)
+        
         # Register message handler with backend
         self.backend.add_message_handler(self.handle_message)
         
@@ -89,6 +105,14 @@ class GUIInterface:
         self.rain_status = self._create_status_indicator(status_frame, "Rain Detection", "Unknown")
         self.delay_status = self._create_status_indicator(status_frame, "Confirmation Delay", "5 seconds")
         self.schedule_status = self._create_status_indicator(status_frame, "Schedule Status", "Not scheduled")
+        self.status_view = StatusViewModel(self.root, {
+            "Arduino Connection": self.connection_status,
+            "Operation Mode": self.mode_status,
+            "Cover Status": self.cover_status,
+            "Rain Detection": self.rain_status,
+            "Confirmation Delay": self.delay_status,
+            "Schedule Status": self.schedule_status
+        })
         
         # Scheduling Frame
         schedule_frame = self._create_section(scrollable_frame, "Schedule Cover")
@@ -98,6 +122,10 @@ class GUIInterface:
         control_frame = self._create_section(scrollable_frame, "Manual Control")
         self._create_control_buttons(control_frame)
         
+        # Rain Intensity Frame
+        chart_frame = self._create_section(scrollable_frame, "Rain Intensity")
+        self._create_intensity_chart(chart_frame)
+        
         # Notifications Frame
         notify_frame = self._create_section(scrollable_frame, "Live Notifications")
         
@@ -292,6 +320,37 @@ class GUIInterface:
         )
         self.btn_auto.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.BOTH, expand=True)
     
+    def _create_intensity_chart(self, parent):
+        """Create the live rain intensity chart and its controls"""
+        controls = tk.Frame(parent, bg=COLORS['surface'])
+        controls.pack(fill=tk.X, pady=(0, 10))
+        
+        self._streaming = False
+        self.btn_stream = self._create_button(
+            controls, "📈 Start Streaming", self.toggle_intensity_stream, COLORS['primary'], height=1)
+        self.btn_stream.pack(side=tk.LEFT, padx=5)
+        
+        for label, seconds in reversed(CHART_SPANS):
+            self._create_button(controls, label, lambda s=seconds: self.set_chart_span(s),
+                                COLORS['surface_light'], height=1).pack(side=tk.RIGHT, padx=2)
+        
+        self.chart = tk.Canvas(parent, height=160, bg=COLORS['background'], highlightthickness=0)
+        self.chart.pack(fill=tk.X)
+        self.chart_line = self.chart.create_line(0, 0, 0, 0, fill=COLORS['primary'], width=1)
+        self.chart_label = self.chart.create_text(
+            8, 8, anchor='nw', text="Intensity streaming off",
+            fill=COLORS['text_secondary'], font=FONTS['small'])
+        
+        # Mouse wheel scrolls back and forward in time
+        self.chart.bind("<MouseWheel>", lambda e: self.scroll_chart(1 if e.delta > 0 else -1))
+        self.chart.bind("<Button-4>", lambda e: self.scroll_chart(1))
+        self.chart.bind("<Button-5>", lambda e: self.scroll_chart(-1))
+        
+        self.chart_span = 600
+        self.chart_offset = 0  # Seconds back from the newest sample
+        self._chart_drawn = None
+        self.root.after(CHART_REFRESH_MS, self._refresh_chart)
+    
     def _create_button(self, parent, text, command, bg_color, height=2):
         """Create a styled button with accessibility features"""
         btn = tk.Button(
@@ -331,24 +390,19 @@ class GUIInterface:
         return '#{:02x}{:02x}{:02x}'.format(*rgb)
         
     def update_status(self, status_type, value, color="#e74c3c"):
-        """Update status indicators"""
-        status_map = {
-            "Arduino Connection": self.connection_status,
-            "Operation Mode": self.mode_status,
-            "Cover Status": self.cover_status,
-            "Rain Detection": self.rain_status,
-            "Confirmation Delay": self.delay_status,
-            "Schedule Status": self.schedule_status
-        }
-        
-        if status_type in status_map:
-            status_map[status_type].config(text=value, fg=color)
+        """Update status indicators (applied on the next frame if changed)"""
+        self.status_view.set(status_type, value, color)
     
     def handle_message(self, message_type, formatted_message, raw_message):
         """Handle messages from backend"""
         # Add to notifications area
         self.add_notification(message_type, formatted_message)
         
+        if self._pending_close and ("MANUAL_CLOSED" in raw_message or
+                                    (message_type == "STATUS" and raw_message == "Cover Status:CLOSED")):
+            # Pending close state is only touched on the Tk thread
+            self.root.after(0, self._confirm_emergency_close, time.perf_counter())
+        
         # Process status updates
         if message_type == "STATUS" and ":" in raw_message:
             status_type, status_value = raw_message.split(":", 1)
@@ -367,19 +421,28 @@ class GUIInterface:
             self.update_status("Operation Mode", "MANUAL", "#f39c12")
         elif "AUTO_MODE" in raw_message:
             self.update_status("Operation Mode", "AUTO", "#3498db")
+        elif message_type == "LINK":
+            self.update_link_status(raw_message)
+        elif raw_message.startswith("Rain intensity streaming"):
+            self._set_streaming(raw_message.endswith(" on"))
         elif "Connected" in raw_message and "successfully" in raw_message:
             self.update_status("Arduino Connection", "Connected", "#2ecc71")
             self.update_schedule_status()  # Update schedule status on connect
             self.get_status()
     
+    def update_link_status(self, link_message):
+        """Show heartbeat link health in the Arduino Connection indicator"""
+        state, _, detail = link_message[len("Link "):].partition(" - ")
+        if state == "UP":
+            self.update_status("Arduino Connection", f"Connected ({detail})", "#2ecc71")
+        elif state == "DEGRADED":
+            self.update_status("Arduino Connection", f"Degraded ({detail})", "#f39c12")
+        else:
+            self.update_status("Arduino Connection", f"Not responding ({detail})", "#e74c3c")
+    
     def process_status_update(self, status_type, status_value):
         """Process status updates from Arduino"""
-        color = "#e74c3c" if "CLOSED" in status_value or "RAINING" in status_value else "#2ecc71"
-        color = "#f39c12" if "MANUAL" in status_value else color
-        color = "#3498db" if "AUTO" in status_value else color
-        color = "#2ecc71" if "Connected" in status_value else color
-        
-        self.update_status(status_type, status_value, color)
+        self.update_status(status_type, status_value, status_color(status_value))
     
     def add_notification(self, category, message):
         """Add notification to the text area"""
@@ -390,6 +453,7 @@ class GUIInterface:
             "COMMAND": "#f39c12",   # Orange
             "ERROR": "#e74c3c",     # Red
             "STATUS": "#9b59b6",    # Purple
+            "LINK": "#f39c12",      # Orange
             "INFO": "#ecf0f1"       # White
         }
         
@@ -405,14 +469,85 @@ class GUIInterface:
             self.notify_text.tag_configure(tag, foreground=color)
     
     def manual_close(self):
-        """Manually close the cover with confirmation modal"""
-        if self._show_confirmation_modal(
-            "Emergency Close",
-            "Are you sure you want to close the cover?\n\nThis is an emergency action.",
-            COLORS['danger']
-        ):
-            if self.backend.manual_close_cover():
-                self._show_success_modal("Success", "✓ Cover is closing now")
+        """Emergency close button: first click arms it, second click fires"""
+        if self._close_armed:
+            self.emergency_close()
+            return
+        
+        self._close_armed = True
+        self.btn_close.config(text="⚠️ CLICK AGAIN TO CLOSE")
+        self._disarm_job = self.root.after(EMERGENCY_ARM_MS, self._disarm_close)
+    
+    def _disarm_close(self):
+        """Return the emergency close button to its unarmed state"""
+        if self._disarm_job:
+            self.root.after_cancel(self._disarm_job)
+            self._disarm_job = None
+        self._close_armed = False
+        self.btn_close.config(text="🛑 EMERGENCY CLOSE")
+    
+    def emergency_close(self, event=None):
+        """
+        Close the cover immediately, with no dialogs.
+        
+        The cover status is shown as closing and the CLOSE command goes out
+        on the backend's priority path; the status is reconciled when the
+        Arduino confirms (or reverted if sending fails or nothing confirms).
+        """
+        clicked_at = time.perf_counter()
+        # Pending before sending, so a confirmation that beats the return is matched
+        earlier = self._pending_close
+        if not earlier:
+            self._pending_close_previous = self.status_view.get("Cover Status")
+        self._pending_close = (clicked_at, None)
+        self.update_status("Cover Status", "CLOSING...", "#e74c3c")
+        sent_at = self.backend.emergency_close_cover()
+        self._disarm_close()
+        
+        if sent_at is None:
+            self._pending_close = earlier
+            if not earlier and self._pending_close_previous:
+                self.update_status("Cover Status", *self._pending_close_previous)
+            self.add_notification("ERROR", "❌ Emergency close failed: Arduino not connected")
+            return
+        
+        self.close_latencies.append(sent_at - clicked_at)
+        self._pending_close = (clicked_at, sent_at)
+        self.root.after(CLOSE_CONFIRM_TIMEOUT_MS, lambda: self._check_close_confirmed(clicked_at))
+    
+    def _confirm_emergency_close(self, confirmed_at):
+        """Record latencies once the Arduino confirms an emergency close (Tk thread)"""
+        if not self._pending_close:
+            return
+        clicked_at, sent_at = self._pending_close
+        self._pending_close = None
+        confirmed_ms = (confirmed_at - clicked_at) * 1000
+        sent_ms = (sent_at - clicked_at) * 1000
+        stats = self.get_close_latency_stats()
+        self.add_notification("SYSTEM", 
+            f"⏱️ Emergency close: command sent in {sent_ms:.1f} ms, "
+            f"confirmed by Arduino in {confirmed_ms:.0f} ms "
+            f"(median send {stats['median']:.1f} ms, max {stats['max']:.1f} ms over {stats['count']})")
+    
+    def _check_close_confirmed(self, clicked_at):
+        """Revert the optimistic cover status if the close was never confirmed"""
+        if self._pending_close and self._pending_close[0] == clicked_at:
+            self._pending_close = None
+            if self._pending_close_previous:
+                self.update_status("Cover Status", *self._pending_close_previous)
+            self.add_notification("ERROR", "⚠️ Arduino did not confirm the emergency close")
+    
+    def get_close_latency_stats(self):
+        """Get click-to-command latency statistics for emergency closes in ms"""
+        if not self.close_latencies:
+            return {'count': 0}
+        samples = sorted(self.close_latencies)
+        return {
+            'count': len(samples),
+            'last': self.close_latencies[-1] * 1000,
+            'median': samples[len(samples) // 2] * 1000,
+            'max': samples[-1] * 1000,
+        }
     
     def manual_open(self):
         """Manually open the cover with confirmation modal"""
@@ -434,6 +569,65 @@ class GUIInterface:
             if self.backend.set_auto_mode():
                 self._show_success_modal("Success", "✓ Switched to automatic mode")
     
+    def toggle_intensity_stream(self):
+        """
+        Ask the Arduino to start or stop streaming rain intensity. The button
+        only changes when the sketch replies "Rain intensity streaming on/off",
+        so a sketch without STREAM support leaves it unchanged.
+        """
+        if self._streaming:
+            self.backend.disable_intensity_stream()
+        else:
+            self.backend.enable_intensity_stream()
+    
+    def _set_streaming(self, streaming):
+        """Show whether the Arduino is streaming (also set from its reply on attach)"""
+        self._streaming = streaming
+        self.btn_stream.config(text="⏸️ Stop Streaming" if streaming else "📈 Start Streaming")
+    
+    def set_chart_span(self, seconds):
+        """Zoom the intensity chart to show the last N seconds"""
+        self.chart_span = seconds
+        self.chart_offset = 0
+    
+    def scroll_chart(self, direction):
+        """Scroll the chart a quarter of its span back (1) or forward (-1)"""
+        self.chart_offset = max(0, self.chart_offset + direction * self.chart_span / 4)
+    
+    def _refresh_chart(self):
+        """Redraw the intensity chart if new samples arrived or the view changed"""
+        self.root.after(CHART_REFRESH_MS, self._refresh_chart)
+        
+        buffer = getattr(self.backend, 'intensity_buffer', None)
+        latest = buffer.latest() if buffer is not None else None
+        if latest is None:
+            return
+        
+        width = self.chart.winfo_width()
+        height = self.chart.winfo_height()
+        view = (buffer.count, self.chart_span, self.chart_offset, width, height)
+        if view == self._chart_drawn or width < 2:
+            return
+        self._chart_drawn = view
+        
+        end = latest[0] - self.chart_offset
+        start = end - self.chart_span
+        times, lows, highs = buffer.downsample(width, start, end)
+        
+        # One polyline through each column's max and min draws the envelope
+        scale_x = width / self.chart_span
+        scale_y = (height - 24) / 1023
+        points = []
+        for t, low, high in zip(times.tolist(), lows.tolist(), highs.tolist()):
+            x = (t - start) * scale_x
+            points.extend((x, height - high * scale_y, x, height - low * scale_y))
+        if len(points) >= 4:
+            self.chart.coords(self.chart_line, *points)
+        
+        position = "live" if not self.chart_offset else f"-{self.chart_offset / 60:.0f} min"
+        self.chart.itemconfig(self.chart_label, 
+            text=f"Last {self.chart_span // 60} min ({position}) · latest {latest[1]:.0f}/1023")
+    
     def get_status(self):
         """Get current status from Arduino"""
         self.backend.get_status()
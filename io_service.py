@@ -0,0 +1,577 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import itertools
+import threading
+from datetime import datetime
+
+DEFAULT_ADDRESS = ('127.0.0.1', 8765)
+
+# Backend methods a client may call
+REMOTE_METHODS = {
+    'is_connected',
+    'manual_close_cover',
+    'manual_open_cover',
+    'emergency_close_cover',
+    'set_auto_mode',
+    'get_status',
+    'set_schedule',
+    'cancel_schedule',
+    'get_schedule_info',
+    'get_link_health',
+    'enable_intensity_stream',
+    'disable_intensity_stream',
+}
+
+# Methods that change the cover or talk to the board; these go through the
+# single arbitrated writer. Lower number = higher priority.
+ARBITRATED_METHODS = {
+    'emergency_close_cover': 0,
+    'manual_close_cover': 1,
+    'manual_open_cover': 2,
+    'set_auto_mode': 2,
+    'set_schedule': 3,
+    'cancel_schedule': 3,
+    'enable_intensity_stream': 4,
+    'disable_intensity_stream': 4,
+    'get_status': 5,
+}
+
+MAX_QUEUED_FRAMES = 1000  # A client this far behind is dropped rather than slowing the I/O process
+SAMPLE_FORWARD_INTERVAL = 0.5
+STATUS_COALESCE_SECONDS = 1.0  # get_status requests within this window share one STATUS command
+
+
+def encode_frame(message):
+    """Encode one protocol message as a JSON line; datetimes are tagged"""
+    def default(value):
+        if isinstance(value, datetime):
+            return {'$dt': value.isoformat()}
+        raise TypeError(f"Cannot encode {type(value).__name__}")
+    return (json.dumps(message, default=default, separators=(',', ':')) + '\n').encode()
+
+
+def decode_frame(line):
+    """Decode one JSON line from the protocol"""
+    def object_hook(obj):
+        if len(obj) == 1 and '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+        return obj
+    return json.loads(line, object_hook=object_hook)
+
+
+def parse_address(text):
+    """
+    Parse "host:port" into a tuple, or "unix:/path" (or a bare absolute
+    path) into a Unix socket path.
+    """
+    if text.startswith('unix:'):
+        return text[5:]
+    if text.startswith('/'):
+        return text
+    host, _, port = text.rpartition(':')
+    return (host or DEFAULT_ADDRESS[0], int(port))
+
+
+def format_address(address):
+    """Format an address from parse_address() for display"""
+    return address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+def open_socket(address):
+    """Create an unconnected stream socket for a TCP tuple or Unix path"""
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+class ClientSession:
+    """One attached client: its socket, outbound frame queue and event filter"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.queue = queue.Queue()
+        self.event_types = None  # None = all events
+        self.history_end = 0  # Sample index up to which the attach history was sent
+
+
+class IOService:
+    """
+    Owns the ArduinoConnection and shares it with any number of local
+    clients (the GUI, logging daemons, diagnostic scripts).
+
+    The serial reader, scheduler and rules keep running here regardless of
+    what the clients are doing. Each client gets a snapshot of the current
+    status (including whether intensity is streaming) and the intensity
+    history on attach, then every message as it happens. A message is
+    encoded once and the same bytes object is queued for every subscriber,
+    so adding observers costs one queue put each and nothing on the board.
+    Each client has its own writer thread; a stalled client is dropped once
+    it falls MAX_QUEUED_FRAMES behind, without delaying the serial reader or
+    the other clients.
+
+    Commands from all clients go through one arbitrated writer thread that
+    runs them in priority order (emergency close first) and coalesces
+    get_status requests, so many clients polling never multiply the
+    traffic on the 9600 baud link. Read-only calls are answered directly.
+
+    Listens on TCP (default 127.0.0.1:8765) or a Unix socket path.
+
+    Protocol: one JSON object per line.
+        client -> service: {"id": 1, "call": "manual_open_cover", "args": []}
+                           {"subscribe": ["STATUS", "LINK"]}   (null = all events)
+        service -> client: {"reply": 1, "result": true}  or  {"reply": 1, "error": "..."}
+                           {"event": [message_type, formatted_message, raw_message]}
+                           {"samples": [[timestamp, value], ...]}
+    """
+    def __init__(self, backend, address=DEFAULT_ADDRESS):
+        self.backend = backend
+        self.address = address
+        self.server = None
+        self.running = False
+        self.clients = {}
+        self.clients_lock = threading.Lock()
+        self.snapshot = {}
+        self.snapshot_lock = threading.Lock()
+        self.commands = queue.PriorityQueue()
+        self._command_seq = itertools.count()
+        self._last_status_request = float('-inf')
+        self._last_status_result = False
+        self._sample_index = 0
+        self._samples_lock = threading.Lock()
+        backend.add_message_handler(self._on_message)
+
+    def start(self):
+        """Start listening for clients"""
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # Stale socket from a previous run
+        self.server = open_socket(self.address)
+        if not isinstance(self.address, str):
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen(8)
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._command_loop, daemon=True).start()
+        threading.Thread(target=self._forward_samples, daemon=True).start()
+
+    def stop(self):
+        """Stop listening and drop all clients"""
+        self.running = False
+        self.commands.put((-1, 0, None, None, None))
+        with self.clients_lock:
+            sessions = list(self.clients.values())
+        for session in sessions:
+            self._drop_client(session)
+        if self.server:
+            self.server.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def _on_message(self, message_type, formatted_message, raw_message):
+        """Backend handler: remember status for snapshots and broadcast the event"""
+        event = (message_type, formatted_message, raw_message)
+        key = None
+        if message_type == "STATUS" and ":" in raw_message:
+            key = raw_message.split(":", 1)[0]
+        elif message_type == "LINK" or "successfully" in raw_message:
+            key = message_type
+        elif raw_message.startswith("Rain intensity streaming"):
+            key = "STREAM"  # Lets an attaching GUI show whether the board is streaming
+        if key:
+            with self.snapshot_lock:
+                self.snapshot[key] = event
+        self._broadcast(encode_frame({'event': event}), message_type)
+
+    def _broadcast(self, frame, message_type=None):
+        """Queue one encoded frame for every subscribed client"""
+        with self.clients_lock:
+            sessions = list(self.clients.values())
+        for session in sessions:
+            if message_type and session.event_types is not None \
+                    and message_type not in session.event_types:
+                continue
+            self._send(session, frame)
+
+    def _send(self, session, frame):
+        """Queue a frame for one client without blocking the caller"""
+        if session.queue.qsize() >= MAX_QUEUED_FRAMES:
+            self._drop_client(session)
+            return
+        session.queue.put(frame)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                break
+            if not isinstance(self.address, str):
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = ClientSession(conn)
+            # Register under the samples lock so no forward batch falls between history and live
+            with self._samples_lock:
+                self._queue_history(session)
+                with self.snapshot_lock:
+                    for event in self.snapshot.values():
+                        session.queue.put(encode_frame({'event': event}))
+                    with self.clients_lock:
+                        self.clients[conn] = session
+            threading.Thread(target=self._write_loop, args=(session,), daemon=True).start()
+            threading.Thread(target=self._read_loop, args=(session,), daemon=True).start()
+
+    def _drop_client(self, session):
+        with self.clients_lock:
+            if self.clients.pop(session.conn, None) is None:
+                return
+        session.queue.put(None)
+        try:
+            session.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        session.conn.close()
+
+    def _write_loop(self, session):
+        while True:
+            frame = session.queue.get()
+            if frame is None:
+                break
+            try:
+                session.conn.sendall(frame)
+            except OSError:
+                break
+        self._drop_client(session)
+
+    def _read_loop(self, session):
+        reader = session.conn.makefile('rb')
+        try:
+            for line in reader:
+                request = None
+                try:
+                    request = decode_frame(line)
+                    if 'subscribe' in request:
+                        types = request['subscribe']
+                        session.event_types = set(types) if types is not None else None
+                        continue
+                    method = request['call']
+                    if method not in REMOTE_METHODS:
+                        raise ValueError(f"Unsupported method: {method}")
+                    args = request.get('args', [])
+                    if method in ARBITRATED_METHODS:
+                        self.commands.put((ARBITRATED_METHODS[method], next(self._command_seq),
+                                           method, args, (session, request.get('id'))))
+                        continue
+                    reply = {'reply': request.get('id'), 'result': getattr(self.backend, method)(*args)}
+                except Exception as e:
+                    reply = {'reply': request.get('id') if isinstance(request, dict) else None,
+                             'error': str(e)}
+                self._send(session, encode_frame(reply))
+        except OSError:
+            pass
+        finally:
+            self._drop_client(session)
+
+    def _command_loop(self):
+        """The single writer: run client commands one at a time, by priority"""
+        while self.running:
+            priority, _, method, args, origin = self.commands.get()
+            if method is None:
+                break
+            session, call_id = origin
+            try:
+                if method == 'get_status' and \
+                        time.monotonic() - self._last_status_request < STATUS_COALESCE_SECONDS:
+                    # A STATUS reply is already on its way to every client
+                    result = self._last_status_result
+                else:
+                    result = getattr(self.backend, method)(*args)
+                    if method == 'get_status':
+                        self._last_status_request = time.monotonic()
+                        self._last_status_result = result
+                reply = {'reply': call_id, 'result': result}
+            except Exception as e:
+                reply = {'reply': call_id, 'error': str(e)}
+            with self.clients_lock:
+                attached = self.clients.get(session.conn) is session
+            if attached:  # The command still ran; only the reply is dropped
+                self._send(session, encode_frame(reply))
+
+    def _queue_history(self, session):
+        """Send a new client the rain intensity samples collected so far"""
+        buffer = getattr(self.backend, 'intensity_buffer', None)
+        if buffer is None or not buffer.count:
+            return
+        times, values, session.history_end = buffer.samples_since(0)
+        session.queue.put(encode_frame({'samples': list(zip(times.tolist(), values.tolist()))}))
+
+    def _forward_samples(self):
+        """Batch new rain intensity samples to all clients"""
+        while self.running:
+            time.sleep(SAMPLE_FORWARD_INTERVAL)
+            buffer = getattr(self.backend, 'intensity_buffer', None)
+            if buffer is None or buffer.count == self._sample_index:
+                continue
+            with self._samples_lock:
+                times, values, self._sample_index = buffer.samples_since(self._sample_index)
+                samples = list(zip(times.tolist(), values.tolist()))
+                first_index = self._sample_index - len(samples)
+                frame = encode_frame({'samples': samples})
+                with self.clients_lock:
+                    sessions = list(self.clients.values())
+                for session in sessions:
+                    # Skip what a newly attached client already got in its history
+                    skip = session.history_end - first_index
+                    if skip <= 0:
+                        self._send(session, frame)
+                    elif skip < len(samples):
+                        self._send(session, encode_frame({'samples': samples[skip:]}))
+
+
+class RemoteBackend:
+    """
+    Client side of IOService, with the ArduinoConnection interface the GUI
+    uses. disconnect() only closes the socket; the device link stays up in
+    the I/O process.
+    """
+    CALL_TIMEOUT = 5
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+        self.sock = None
+        self.message_handlers = []
+        self.intensity_buffer = None
+        self._buffer_error = None
+        self._next_id = 0
+        self._pending = {}
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def add_message_handler(self, handler):
+        """Add a function to handle incoming messages"""
+        self.message_handlers.append(handler)
+
+    def connect(self):
+        """Attach to the I/O service"""
+        try:
+            sock = open_socket(self.address)
+            sock.settimeout(self.CALL_TIMEOUT)
+            sock.connect(self.address)
+            sock.settimeout(None)
+            if not isinstance(self.address, str):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            self._notify_handlers("ERROR", f"❌ I/O service unavailable at {format_address(self.address)}: {e}")
+            return False
+        self.sock = sock
+        threading.Thread(target=self._read_loop, args=(self.sock,), daemon=True).start()
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+        return True
+
+    def disconnect(self):
+        """Detach from the I/O service (the Arduino stays connected)"""
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _read_loop(self, sock):
+        """Route replies to waiting calls and queue events for the handlers"""
+        try:
+            for line in sock.makefile('rb'):
+                message = decode_frame(line)
+                if 'event' in message:
+                    self._events.put(message['event'])
+                elif 'samples' in message:
+                    buffer = self._get_intensity_buffer()
+                    if buffer is not None:
+                        for timestamp, value in message['samples']:
+                            buffer.append(timestamp, value)
+                elif 'reply' in message:
+                    with self._lock:
+                        waiter = self._pending.pop(message['reply'], None)
+                    if waiter:
+                        waiter[1].append(message)
+                        waiter[0].set()
+        except (OSError, ValueError):
+            pass
+        if sock is self.sock:
+            self.sock = None
+            self._notify_handlers("ERROR", "❌ Lost connection to I/O service")
+        self._events.put(None)
+
+    def _dispatch_loop(self):
+        """
+        Run handlers off the socket reader thread, so a handler may itself
+        call the service (e.g. get_status on connect) without deadlocking.
+        """
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            self._dispatch(*event)
+
+    def _dispatch(self, message_type, formatted_message, raw_message):
+        for handler in self.message_handlers:
+            try:
+                handler(message_type, formatted_message, raw_message)
+            except Exception as e:
+                print(f"Handler error: {e}")
+
+    def _notify_handlers(self, message_type, message):
+        """Notify handlers of a client-side message"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self._dispatch(message_type, f"[{timestamp}] {message}", message)
+
+    def _call(self, method, *args, default=False):
+        """Call a backend method in the I/O process and wait for the result"""
+        if not self.sock:
+            return default
+        with self._lock:
+            self._next_id += 1
+            call_id = self._next_id
+            waiter = (threading.Event(), [])
+            self._pending[call_id] = waiter
+        try:
+            with self._send_lock:
+                self.sock.sendall(encode_frame({'id': call_id, 'call': method, 'args': list(args)}))
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(call_id, None)
+            self._notify_handlers("ERROR", f"I/O service call failed: {e}")
+            return default
+        if not waiter[0].wait(self.CALL_TIMEOUT):
+            with self._lock:
+                self._pending.pop(call_id, None)
+            self._notify_handlers("ERROR", f"I/O service did not answer {method}")
+            return default
+        reply = waiter[1][0]
+        if 'error' in reply:
+            self._notify_handlers("ERROR", f"{method} failed: {reply['error']}")
+            return default
+        return reply['result']
+
+    def subscribe(self, event_types=None):
+        """Only receive these message types (None = all)"""
+        if not self.sock:
+            return False
+        with self._send_lock:
+            self.sock.sendall(encode_frame({'subscribe': list(event_types) if event_types else None}))
+        return True
+
+    def is_connected(self):
+        return bool(self._call('is_connected'))
+
+    def manual_close_cover(self):
+        return self._call('manual_close_cover')
+
+    def manual_open_cover(self):
+        return self._call('manual_open_cover')
+
+    def emergency_close_cover(self):
+        """Returns the local time.perf_counter() once the service has sent CLOSE"""
+        if self._call('emergency_close_cover', default=None) is None:
+            return None
+        return time.perf_counter()
+
+    def set_auto_mode(self):
+        return self._call('set_auto_mode')
+
+    def get_status(self):
+        return self._call('get_status')
+
+    def set_schedule(self, open_time, hours_open):
+        return self._call('set_schedule', open_time, hours_open)
+
+    def cancel_schedule(self):
+        return self._call('cancel_schedule')
+
+    def get_schedule_info(self):
+        return self._call('get_schedule_info', default={'active': False})
+
+    def get_link_health(self):
+        return self._call('get_link_health', default={'state': 'DOWN'})
+
+    def _get_intensity_buffer(self, capacity=6 * 3600 * 10):
+        """Create the local sample buffer on first use (None without NumPy)"""
+        if self.intensity_buffer is None and self._buffer_error is None:
+            try:
+                from rain_buffer import RainIntensityBuffer
+            except ImportError as e:
+                self._buffer_error = e
+                self._notify_handlers("ERROR", f"Intensity streaming unavailable: {e}")
+                return None
+            self.intensity_buffer = RainIntensityBuffer(capacity)
+        return self.intensity_buffer
+
+    def enable_intensity_stream(self, capacity=6 * 3600 * 10):
+        if self._get_intensity_buffer(capacity) is None:
+            return False
+        return self._call('enable_intensity_stream')
+
+    def disable_intensity_stream(self):
+        return self._call('disable_intensity_stream')
+
+
+def main():
+    """
+    Run the I/O service, or use it from the command line:
+        python io_service.py --port COM8                  serve the Arduino
+        python io_service.py --tail [--types STATUS LINK] print live events
+        python io_service.py --call get_status            call one method
+    """
+    parser = argparse.ArgumentParser(description="Smart Clothes Protector I/O service")
+    parser.add_argument("--port", default="COM8", help="Arduino serial port (default: COM8)")
+    parser.add_argument("--listen", default=f"{DEFAULT_ADDRESS[0]}:{DEFAULT_ADDRESS[1]}",
+                        help="HOST:PORT or unix:/path to serve or attach to (default: 127.0.0.1:8765)")
+    parser.add_argument("--tail", action="store_true", help="attach and print events")
+    parser.add_argument("--types", nargs="+", help="with --tail, only these message types")
+    parser.add_argument("--call", metavar="METHOD", help="attach, call a method and print the result")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="record raw serial traffic to PATH for serial_replay.py")
+    args = parser.parse_args()
+    address = parse_address(args.listen)
+
+    if args.tail or args.call:
+        client = RemoteBackend(address)
+        if args.tail:
+            client.add_message_handler(
+                lambda message_type, formatted_message, raw_message:
+                    print(f"{message_type:8} {formatted_message}"))
+        if not client.connect():
+            print(f"Cannot attach to {args.listen}")
+            return 1
+        if args.call:
+            print(client._call(args.call, default=None))
+            client.disconnect()
+            return 0
+        client.subscribe(args.types)
+        try:
+            while client.sock:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        client.disconnect()
+        return 0
+
+    from main_app import ClothesProtectorApp
+
+    app = ClothesProtectorApp(port=args.port, headless=True, capture_path=args.capture)
+    service = IOService(app.backend, address)
+    service.start()
+    print(f"I/O service listening on {args.listen}; attach with: python main_app.py --attach {args.listen}")
+    try:
+        app.run()
+    finally:
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
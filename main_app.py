@@ -1,7 +1,13 @@
 import tkinter as tk
 import threading
 import time
+import os
+import argparse
 from arduino_connection import ArduinoConnection
+from schedule_store import ScheduleStore
+from metrics import MetricsServer
+from rules_engine import RulesEngine, load_rules
+from io_service import RemoteBackend, parse_address
 from gui_interface import GUIInterface
 
 class ClothesProtectorApp:
@@ -15,11 +21,50 @@ class ClothesProtectorApp:
     Scheduling:
     - Schedule cover to open at a specific time
     - Automatically close after specified hours
+    - Schedules are saved to schedules.db and restored after a restart
+    
+    With capture_path set, every raw line from the Arduino is recorded for
+    serial_replay.py.
+    
+    Automation rules are loaded from rules.json if present (see rules_engine.py).
+    
+    With headless=True no Tk window is created; the backend, scheduler and
+    metrics endpoint run on their own (used by the soak harness and
+    io_service.py).
+    
+    With io_address set, only the GUI runs here: it attaches to an
+    io_service.py process that owns the serial port, scheduler and rules.
     """
-    def __init__(self):
-        self.root = tk.Tk()
-        self.backend = ArduinoConnection(port='COM8')  # Your Arduino port
-        self.gui = GUIInterface(self.root, self.backend)
+    def __init__(self, port='COM8', headless=False, schedule_db=None, metrics_port=9108,
+                 io_address=None, capture_path=None):
+        self.headless = headless
+        self.capture_path = capture_path
+        self.root = None if headless else tk.Tk()
+        self.schedule_store = None
+        self.metrics_server = None
+        self.rules = None
+        if io_address:
+            self.backend = RemoteBackend(io_address)
+        else:
+            self.schedule_store = ScheduleStore(schedule_db or
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedules.db'))
+            self.backend = ArduinoConnection(port=port,  # Your Arduino port
+                                             schedule_store=self.schedule_store)
+            # http://127.0.0.1:9108/metrics
+            if metrics_port:
+                self.metrics_server = MetricsServer(self.backend.metrics, port=metrics_port)
+        self.gui = None if headless else GUIInterface(self.root, self.backend)
+        rules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+        if not io_address and os.path.exists(rules_path):
+            try:
+                self.rules = RulesEngine(load_rules(rules_path))
+                self.rules.attach(self.backend)
+            except (OSError, ValueError) as e:
+                message = f"Rules not loaded, running without automation rules: {e}"
+                if self.gui:
+                    self.gui.add_notification("ERROR", f"❌ {message}")
+                else:
+                    print(message)
         self.running = True
         self.schedule_thread = None
         
@@ -29,9 +74,11 @@ class ClothesProtectorApp:
             while self.running:
                 try:
                     action = self.backend.check_schedule()
-                    if action:
+                    if action and self.gui:
                         # Update GUI schedule status
                         self.root.after(0, self.gui.update_schedule_status)
+                    if self.rules:
+                        self.rules.tick()
                 except Exception as e:
                     print(f"Schedule checker error: {e}")
                 time.sleep(1)  # Check every second
@@ -39,31 +86,76 @@ class ClothesProtectorApp:
         self.schedule_thread = threading.Thread(target=check_schedule, daemon=True)
         self.schedule_thread.start()
         
+    def start(self):
+        """Connect to the Arduino and start background services"""
+        if self.capture_path and not isinstance(self.backend, RemoteBackend):
+            try:
+                self.backend.start_capture(self.capture_path)
+            except OSError as e:
+                print(f"Serial capture unavailable: {e}")
+        
+        # Connect to Arduino
+        if self.backend.connect():
+            print("Application started successfully!")
+        else:
+            print("Failed to connect to Arduino, but GUI will still run.")
+        
+        if isinstance(self.backend, RemoteBackend):
+            return  # Scheduling and metrics run in the I/O service
+        
+        # Start schedule checker
+        self.start_schedule_checker()
+        
+        if self.metrics_server:
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                print(f"Metrics endpoint unavailable: {e}")
+    
+    def shutdown(self):
+        """Stop background services and disconnect"""
+        self.running = False
+        self.backend.disconnect()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.schedule_store:
+            self.schedule_store.close()
+    
     def run(self):
         """Start the application"""
         try:
-            # Connect to Arduino
-            if self.backend.connect():
-                print("Application started successfully!")
-            else:
-                print("Failed to connect to Arduino, but GUI will still run.")
+            self.start()
             
-            # Start schedule checker
-            self.start_schedule_checker()
-            
-            # Start the GUI
-            self.root.mainloop()
+            if self.headless:
+                while self.running:
+                    time.sleep(0.5)
+            else:
+                # Start the GUI
+                self.root.mainloop()
             
+        except KeyboardInterrupt:
+            pass
         except Exception as e:
             print(f"Application error: {e}")
         finally:
             # Cleanup
-            self.running = False
-            self.backend.disconnect()
+            self.shutdown()
 
 def main():
     """Main function"""
-    app = ClothesProtectorApp()
+    parser = argparse.ArgumentParser(description="Smart Clothes Protector")
+    parser.add_argument("--port", default="COM8", help="Arduino serial port (default: COM8)")
+    parser.add_argument("--attach", metavar="HOST:PORT",
+                        help="run only the GUI, attached to a running io_service.py")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="record raw serial traffic to PATH for serial_replay.py")
+    args = parser.parse_args()
+    if args.capture and args.attach:
+        parser.error("--capture records the serial port; pass it to io_service.py instead")
+    
+    app = ClothesProtectorApp(port=args.port,
+                              io_address=parse_address(args.attach) if args.attach else None,
+                              capture_path=args.capture)
     app.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Command label values; anything else is counted as "other" so arbitrary
+# send_command() text can't create unbounded series
+COMMAND_TYPES = ("OPEN", "CLOSE", "AUTO", "STATUS", "PING", "STREAM", "DELAY", "other")
+
+
+def command_type(command):
+    """Map a command line onto one of COMMAND_TYPES ("STREAM ON" counts as STREAM)"""
+    word = command.split(None, 1)[0].upper() if command.strip() else ""
+    return word if word in COMMAND_TYPES else "other"
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """
+    Monotonic counter whose increment is a single next() on itertools.count.
+
+    next() on a count object is atomic under the GIL, so neither increments
+    nor reads take a lock. The count is read from the object's repr,
+    "count(<next value>)", which does not advance it. That repr format is a
+    CPython implementation detail (stable since Python 2, but not part of
+    the documented API).
+    """
+    def __init__(self):
+        self._count = itertools.count()
+
+    def inc(self):
+        next(self._count)
+
+    def value(self):
+        return int(repr(self._count)[len("count("):-1])
+
+
+class Gauge:
+    """Value that can go up and down; a plain attribute store"""
+    def __init__(self, value=0):
+        self._value = value
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+
+class ControllerMetrics:
+    """
+    Counters and gauges for one ArduinoConnection, rendered in the
+    Prometheus text exposition format.
+
+    Counters are exposed as *_total; rates such as lines read per second are
+    derived by Prometheus, e.g. rate(clothes_protector_lines_read_total[1m]).
+    """
+    PREFIX = "clothes_protector_"
+
+    def __init__(self, port):
+        self.port = port
+        self.lines_read = Counter()
+        self.parse_errors = Counter()
+        self.read_errors = Counter()
+        self.handler_exceptions = Counter()
+        self.commands_sent = {kind: Counter() for kind in COMMAND_TYPES}
+        self.schedule_fires = Counter()
+        self.schedule_misses = Counter()
+        self.cover_cycles = Counter()
+        self.cover_closed = Gauge(-1)
+        self.raining = Gauge(-1)
+        self.link_up = Gauge(0)
+
+    def command_sent(self, command):
+        """Count a command by type"""
+        self.commands_sent[command_type(command)].inc()
+
+    def set_cover_state(self, closed):
+        """Record the cover state; a close followed by an open is one cycle"""
+        if not closed and self.cover_closed.value() == 1:
+            self.cover_cycles.inc()
+        self.cover_closed.set(1 if closed else 0)
+
+    def render(self):
+        """Render all metrics in Prometheus text exposition format"""
+        labels = f'port="{escape_label(self.port)}"'
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {self.PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {self.PREFIX}{name} {kind}")
+            for extra, value in samples:
+                lines.append(f"{self.PREFIX}{name}{{{labels}{extra}}} {value}")
+
+        metric("lines_read_total", "counter", "Lines read from the serial port.",
+               [("", self.lines_read.value())])
+        metric("parse_errors_total", "counter", "Lines with no recognised message prefix.",
+               [("", self.parse_errors.value())])
+        metric("read_errors_total", "counter", "Serial read or decode failures.",
+               [("", self.read_errors.value())])
+        metric("handler_exceptions_total", "counter", "Exceptions raised by message handlers.",
+               [("", self.handler_exceptions.value())])
+        metric("commands_sent_total", "counter", "Commands written to the Arduino by type.",
+               [(f',command="{kind}"', counter.value())
+                for kind, counter in self.commands_sent.items()])
+        metric("schedule_fires_total", "counter", "Scheduled open/close actions executed.",
+               [("", self.schedule_fires.value())])
+        metric("schedule_misses_total", "counter",
+               "Scheduled actions missed while the app was down (run late on restore).",
+               [("", self.schedule_misses.value())])
+        metric("cover_cycles_total", "counter", "Cover close/open cycles.",
+               [("", self.cover_cycles.value())])
+        metric("cover_closed", "gauge", "1 if the cover is closed, 0 if open, -1 if unknown.",
+               [("", self.cover_closed.value())])
+        metric("raining", "gauge", "1 if rain is detected, 0 if dry, -1 if unknown.",
+               [("", self.raining.value())])
+        metric("link_up", "gauge", "1 if the Arduino answers heartbeats.",
+               [("", self.link_up.value())])
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Tiny HTTP listener serving /metrics for a ControllerMetrics.
+
+    Binds to localhost by default; scrape with Prometheus or curl.
+    """
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        """Start serving in a background thread"""
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the listener"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
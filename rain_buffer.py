@@ -0,0 +1,158 @@
+import threading
+import numpy as np
+
+
+class RainIntensityBuffer:
+    """
+    Preallocated ring buffer of (timestamp, intensity) samples.
+
+    Appending writes into fixed NumPy arrays, so streaming allocates no new
+    arrays per sample. For drawing, min/max levels over blocks of LEVELS
+    samples are cached and extended incrementally as samples arrive, so
+    zooming or scrolling a chart over hours of 10 Hz data only reduces a few
+    thousand cached blocks instead of the raw samples.
+    """
+    LEVELS = (4, 16, 64, 256, 1024)  # Samples per block for each cached level
+
+    def __init__(self, capacity=6 * 3600 * 10):
+        block = self.LEVELS[-1]
+        self.capacity = -(-capacity // block) * block  # Round up so blocks never wrap
+        self.times = np.zeros(self.capacity, dtype=np.float64)
+        self.values = np.zeros(self.capacity, dtype=np.float32)
+        self.count = 0  # Samples ever appended; absolute index of the next sample
+        self.lock = threading.Lock()
+        self._levels = {
+            size: (np.zeros(self.capacity // size, dtype=np.float32),
+                   np.zeros(self.capacity // size, dtype=np.float32))
+            for size in self.LEVELS
+        }
+        self._blocks_done = {size: 0 for size in self.LEVELS}
+
+    def append(self, timestamp, value):
+        """
+        Add one sample, overwriting the oldest when full. Timestamps must not
+        go backwards (lookups binary-search them), so an earlier one is
+        clamped to the previous sample's.
+        """
+        with self.lock:
+            if self.count:
+                timestamp = max(timestamp, self.times[(self.count - 1) % self.capacity])
+            i = self.count % self.capacity
+            self.times[i] = timestamp
+            self.values[i] = value
+            self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self):
+        """Get the most recent (timestamp, value), or None if empty"""
+        with self.lock:
+            if not self.count:
+                return None
+            i = (self.count - 1) % self.capacity
+            return float(self.times[i]), float(self.values[i])
+
+    def samples_since(self, index):
+        """
+        Get samples appended since absolute index (e.g. a previous count).
+
+        Returns (times, values, next_index); samples already overwritten
+        are skipped.
+        """
+        with self.lock:
+            start = max(index, self.count - self.capacity)
+            idx = np.arange(start, self.count) % self.capacity
+            return self.times[idx], self.values[idx], self.count
+
+    def downsample(self, width, start_time=None, end_time=None):
+        """
+        Reduce the samples between start_time and end_time to at most
+        width (time, min, max) columns for drawing.
+
+        Returns three NumPy arrays. Windows of at most width samples come
+        back raw (min == max); larger ones use min/max per column built from
+        the coarsest cached level that still gives each column at least a
+        block, plus the partial blocks at either end reduced from the raw
+        samples, so the newest samples are always drawn.
+        """
+        with self.lock:
+            first = max(0, self.count - self.capacity)
+            start = first if start_time is None else self._index_at(start_time, first)
+            end = self.count if end_time is None else self._index_at(end_time, first)
+            n = end - start
+            if n <= 0 or width <= 0:
+                empty = np.zeros(0, dtype=np.float32)
+                return empty, empty, empty
+
+            if n <= width:
+                idx = np.arange(start, end) % self.capacity
+                values = self.values[idx]
+                return self.times[idx], values, values
+
+            per_column = n / width
+            size = max((s for s in self.LEVELS if s <= per_column), default=None)
+            if size is None:
+                return self._reduce_raw(start, end, width)
+
+            self._update_level(size, first)
+            mins, maxs = self._levels[size]
+            rows = self.capacity // size
+            k0 = -(-start // size)
+            k1 = end // size
+            if k1 - k0 < width:
+                return self._reduce_raw(start, end, width)
+
+            # Whole blocks from the cache, partial blocks at the ends from raw samples
+            blocks = np.arange(k0, k1)
+            parts = [(blocks * size, mins[blocks % rows], maxs[blocks % rows])]
+            if k0 * size > start:
+                parts.insert(0, self._reduce_span(start, k0 * size))
+            if end > k1 * size:
+                parts.append(self._reduce_span(k1 * size, end))
+            starts, unit_mins, unit_maxs = (np.concatenate(column) for column in zip(*parts))
+
+            edges = np.linspace(0, len(starts), width + 1).astype(np.int64)[:-1]
+            times = self.times[starts[edges] % self.capacity]
+            return (times,
+                    np.minimum.reduceat(unit_mins, edges),
+                    np.maximum.reduceat(unit_maxs, edges))
+
+    def _reduce_raw(self, start, end, width):
+        """Min/max per column straight from the raw samples"""
+        idx = np.arange(start, end) % self.capacity
+        values = self.values[idx]
+        edges = np.linspace(0, len(idx), width + 1).astype(np.int64)[:-1]
+        return (self.times[idx[edges]],
+                np.minimum.reduceat(values, edges),
+                np.maximum.reduceat(values, edges))
+
+    def _reduce_span(self, start, end):
+        """One (start index, min, max) unit for a partial block of raw samples"""
+        values = self.values[np.arange(start, end) % self.capacity]
+        return np.array([start]), values.min(keepdims=True), values.max(keepdims=True)
+
+    def _update_level(self, size, first):
+        """Compute min/max for blocks completed since the last query"""
+        mins, maxs = self._levels[size]
+        rows = self.capacity // size
+        k0 = max(self._blocks_done[size], -(-first // size))
+        k1 = self.count // size
+        if k1 <= k0:
+            return
+        blocks = np.arange(k0, k1) % rows
+        grid = self.values.reshape(rows, size)
+        mins[blocks] = grid[blocks].min(axis=1)
+        maxs[blocks] = grid[blocks].max(axis=1)
+        self._blocks_done[size] = k1
+
+    def _index_at(self, timestamp, first):
+        """Absolute index of the first sample at or after timestamp"""
+        lo, hi = first, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[mid % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
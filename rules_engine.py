@@ -0,0 +1,223 @@
+import json
+import time
+import operator
+import threading
+
+# Comparison operators allowed in a condition
+OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'in': lambda value, options: value in options,
+}
+
+# Fields computed from other state; value is (fields they depend on, changes with time)
+DERIVED_FIELDS = {
+    'seconds_since_rain': ({'rain_detection'}, True),
+    'time': (set(), True),
+}
+
+CLOCK = '@clock'  # Pseudo-field for rules that must be re-checked as time passes
+COMMANDS = {'OPEN', 'CLOSE', 'AUTO', 'DELAY'}  # DELAY <seconds> sets the reopen delay after rain
+
+
+def field_name(status_type):
+    """Normalise a STATUS field name, e.g. "Cover Status" -> "cover_status\""""
+    return status_type.strip().lower().replace(' ', '_')
+
+
+def load_rules(path):
+    """Load a list of rule definitions from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        definitions = json.load(f)
+    if not isinstance(definitions, list) or not all(isinstance(d, dict) for d in definitions):
+        raise ValueError(f"{path} must contain a list of rule objects")
+    return definitions
+
+
+def compile_condition(condition):
+    """
+    Compile a condition into (predicate, fields it reads).
+
+    A condition is one of:
+        {"field": "cover_status", "eq": "OPEN"}     (eq, ne, lt, le, gt, ge, in)
+        {"all": [condition, ...]}
+        {"any": [condition, ...]}
+        {"not": condition}
+    The predicate takes a CoverState and returns a bool.
+    """
+    if 'all' in condition or 'any' in condition:
+        combine = all if 'all' in condition else any
+        parts = [compile_condition(c) for c in condition['all' if 'all' in condition else 'any']]
+        predicates = tuple(p for p, _ in parts)
+        fields = set().union(*(f for _, f in parts))
+        return (lambda state: combine(p(state) for p in predicates)), fields
+
+    if 'not' in condition:
+        inner, fields = compile_condition(condition['not'])
+        return (lambda state: not inner(state)), fields
+
+    if 'field' not in condition:
+        raise ValueError(f"Condition needs 'field', 'all', 'any' or 'not': {condition}")
+    field = condition['field']
+    ops = [(OPERATORS[name], value) for name, value in condition.items() if name in OPERATORS]
+    if len(ops) != 1:
+        raise ValueError(f"Condition on '{field}' needs exactly one operator: {condition}")
+    compare, expected = ops[0]
+
+    def predicate(state):
+        value = state.get(field)
+        if value is None:
+            return False
+        try:
+            return compare(value, expected)
+        except TypeError:
+            return False
+
+    return predicate, {field}
+
+
+class Rule:
+    """A compiled rule: predicate, the fields it depends on, and its command"""
+    def __init__(self, definition):
+        self.name = definition.get('name', 'unnamed')
+        self.command = str(definition.get('then', '')).strip().upper()
+        word, _, argument = self.command.partition(' ')
+        if word not in COMMANDS or (word == 'DELAY') != argument.isdigit():
+            raise ValueError(f"Rule '{self.name}': 'then' must be OPEN, CLOSE, AUTO or DELAY <seconds>")
+        if 'when' not in definition:
+            raise ValueError(f"Rule '{self.name}' has no 'when' condition")
+        self.cooldown = float(definition.get('cooldown', 0))
+        self.predicate, fields = compile_condition(definition['when'])
+
+        # Expand derived fields into what they are computed from
+        self.dependencies = set()
+        for field in fields:
+            depends_on, clock = DERIVED_FIELDS.get(field, ({field}, False))
+            self.dependencies |= depends_on
+            if clock:
+                self.dependencies.add(CLOCK)
+
+
+class CoverState:
+    """Fields reported by one cover plus per-rule firing state"""
+    def __init__(self, backend, rule_count):
+        self.backend = backend
+        self.fields = {}
+        self.raining = False
+        self.rain_ended_at = None
+        self.active = [False] * rule_count
+        self.last_fired = [float('-inf')] * rule_count
+        self.suppressed = set()  # Rules that matched during their cooldown
+        self.lock = threading.Lock()
+
+    def get(self, field):
+        if field == 'seconds_since_rain':
+            if self.raining:
+                return 0.0
+            return time.time() - self.rain_ended_at if self.rain_ended_at else float('inf')
+        if field == 'time':
+            return time.strftime("%H:%M")
+        return self.fields.get(field)
+
+
+class RulesEngine:
+    """
+    Evaluates declarative automation rules against each attached cover.
+
+    Rules are compiled once into predicates. Each STATUS event updates the
+    cover's fields and re-evaluates only the rules that read a field that
+    changed; rules on time (time, seconds_since_rain) are also re-checked
+    by tick(). A rule sends its command when its condition becomes true,
+    not on every event while it stays true. A rule that becomes true during
+    its cooldown fires once the cooldown ends, if it is still true then.
+
+    Rules react to what the cover reports, so a rule on cover_status only
+    runs after the sketch has already moved the servo. To stop the sketch's
+    automatic reopen after rain, lengthen its reopen delay with DELAY
+    instead of closing again (CLOSE also switches the sketch to MANUAL).
+
+    Example rules.json:
+        [
+          {"name": "no reopen within 30 min of rain",
+           "when": {"field": "rain_detection", "eq": "RAINING"},
+           "then": "DELAY 1800"},
+          {"name": "closed after sunset",
+           "when": {"any": [{"field": "time", "ge": "19:30"},
+                            {"field": "time", "lt": "06:00"}]},
+           "then": "CLOSE"},
+          {"name": "humid", "when": {"field": "humidity", "gt": 85}, "then": "CLOSE"}
+        ]
+    Any "STATUS:<Field>:<value>" line from the sketch becomes a field
+    (e.g. "STATUS:Humidity:87" -> humidity = 87.0).
+    """
+    def __init__(self, definitions):
+        self.rules = [Rule(d) for d in definitions]
+        self.index = {}
+        for i, rule in enumerate(self.rules):
+            for dependency in rule.dependencies:
+                self.index.setdefault(dependency, []).append(i)
+        self.clock_rules = self.index.get(CLOCK, [])
+        self.covers = []
+
+    def attach(self, backend):
+        """Start applying the rules to a backend's cover"""
+        state = CoverState(backend, len(self.rules))
+        self.covers.append(state)
+        backend.add_message_handler(
+            lambda message_type, formatted_message, raw_message:
+                self._handle_message(state, message_type, raw_message))
+        return state
+
+    def tick(self):
+        """Re-check time-dependent rules, and rules waiting out a cooldown, on every cover"""
+        for state in self.covers:
+            with state.lock:
+                if self.clock_rules or state.suppressed:
+                    self._evaluate(state, self.clock_rules + sorted(state.suppressed))
+
+    def _handle_message(self, state, message_type, raw_message):
+        if message_type != "STATUS" or ":" not in raw_message:
+            return
+        status_type, value = raw_message.split(":", 1)
+        field = field_name(status_type)
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+
+        with state.lock:
+            if state.fields.get(field) == value:
+                return
+            state.fields[field] = value
+            if field == 'rain_detection':
+                raining = value == "RAINING"
+                if state.raining and not raining:
+                    state.rain_ended_at = time.time()
+                state.raining = raining
+            self._evaluate(state, self.index.get(field, ()))
+
+    def _evaluate(self, state, rule_indices):
+        """Evaluate the given rules for one cover (caller holds state.lock)"""
+        now = time.monotonic()
+        for i in rule_indices:
+            rule = self.rules[i]
+            matched = rule.predicate(state)
+            if not matched:
+                state.active[i] = False
+                state.suppressed.discard(i)
+                continue
+            if state.active[i]:
+                continue
+            if now - state.last_fired[i] < rule.cooldown:
+                state.suppressed.add(i)  # Stays inactive so tick() fires it after the cooldown
+                continue
+            state.active[i] = True
+            state.suppressed.discard(i)
+            state.last_fired[i] = now
+            state.backend.notify("SYSTEM", f"📐 Rule '{rule.name}' → {rule.command}")
+            state.backend.send_command(rule.command)
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class ScheduleStore:
+    """
+    Durable storage for cover schedules, one row per serial port.
+
+    Uses SQLite in WAL mode so a power loss never leaves a half-written
+    schedule behind, and readers (e.g. other fleet workers) don't block the
+    writer. Every change is written in its own transaction and synced to
+    disk before it returns (synchronous=FULL); schedule writes are rare, so
+    the extra fsync is cheap.
+    """
+    def __init__(self, path='schedules.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS schedules (
+                    port TEXT PRIMARY KEY,
+                    open_time REAL NOT NULL,
+                    close_time REAL NOT NULL,
+                    opened INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    def save(self, port, open_time, close_time, opened=False):
+        """Insert or replace the schedule for a port"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO schedules (port, open_time, close_time, opened) "
+                "VALUES (?, ?, ?, ?)",
+                (port, open_time.timestamp(), close_time.timestamp(), int(opened)))
+
+    def mark_opened(self, port):
+        """Record that the scheduled open already ran"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE schedules SET opened = 1 WHERE port = ?", (port,))
+
+    def delete(self, port):
+        """Remove the schedule for a port (cancelled or completed)"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM schedules WHERE port = ?", (port,))
+
+    def load(self, port):
+        """Get the stored schedule for a port, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT port, open_time, close_time, opened FROM schedules WHERE port = ?",
+                (port,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def load_all(self):
+        """Get all stored schedules as a dict keyed by port"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT port, open_time, close_time, opened FROM schedules").fetchall()
+        return {row[0]: self._row_to_dict(row) for row in rows}
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def _row_to_dict(row):
+        port, open_time, close_time, opened = row
+        return {
+            'port': port,
+            'open_time': datetime.fromtimestamp(open_time),
+            'close_time': datetime.fromtimestamp(close_time),
+            'opened': bool(opened),
+        }
@@ -0,0 +1,81 @@
+import sys
+import time
+import argparse
+from arduino_connection import ArduinoConnection
+
+
+def load_capture(path):
+    """
+    Load a capture written by ArduinoConnection.start_capture.
+
+    Returns a list of (offset_seconds, raw_line) tuples in file order.
+    Blank or malformed lines are skipped.
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            offset, sep, message = line.rstrip('\n').partition('\t')
+            if not sep or not message:
+                continue
+            try:
+                entries.append((float(offset), message))
+            except ValueError:
+                continue
+    return entries
+
+
+def replay_capture(backend, capture, speed=1.0):
+    """
+    Feed a capture back through the backend's message pipeline.
+
+    Args:
+        backend: ArduinoConnection whose handlers should receive the messages
+        capture: path to a capture file, or a list from load_capture()
+        speed: playback multiplier (1.0 = real time, 10.0 = 10x faster).
+               None or 0 replays as fast as possible.
+
+    Returns a dict with the number of lines replayed, elapsed seconds and
+    the achieved message rate.
+    """
+    entries = load_capture(capture) if isinstance(capture, str) else capture
+
+    start = time.monotonic()
+    for offset, message in entries:
+        if speed:
+            delay = start + offset / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        backend._process_arduino_message(message)
+    elapsed = time.monotonic() - start
+
+    return {
+        'lines': len(entries),
+        'elapsed': elapsed,
+        'rate': len(entries) / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def main():
+    """Replay a capture file from the command line"""
+    parser = argparse.ArgumentParser(description="Replay a raw Arduino serial capture")
+    parser.add_argument("capture", help="capture file written by start_capture()")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="playback multiplier, 0 for as fast as possible (default: 1.0)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="don't print messages, only the final summary")
+    args = parser.parse_args()
+
+    backend = ArduinoConnection()
+    if not args.quiet:
+        backend.add_message_handler(
+            lambda message_type, formatted_message, raw_message:
+                print(f"{message_type:8} {formatted_message}"))
+
+    stats = replay_capture(backend, args.capture, speed=args.speed)
+    print(f"Replayed {stats['lines']} lines in {stats['elapsed']:.2f}s "
+          f"({stats['rate']:.0f} msg/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
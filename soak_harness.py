@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import tracemalloc
+from main_app import ClothesProtectorApp
+
+# One rain cycle as the sketch reports it
+RAIN_CYCLE = [
+    "NOTIFICATION:Rain detected! Cover CLOSED immediately",
+    "STATUS:Cover Status:CLOSED",
+    "STATUS:Rain Detection:RAINING",
+    "NOTIFICATION:Rain stopped! Confirming in 5 seconds...",
+    "NOTIFICATION:CONFIRMED_DRY - Cover OPENED",
+    "STATUS:Cover Status:OPEN",
+    "STATUS:Rain Detection:DRY",
+]
+
+# Replies to host commands, mirroring processCommand() in the sketch
+COMMAND_REPLIES = {
+    b"PING": ["PONG"],
+    b"OPEN": ["NOTIFICATION:MANUAL_OPENED - Cover opened manually",
+              "STATUS:Operation Mode:MANUAL", "STATUS:Cover Status:OPEN"],
+    b"CLOSE": ["NOTIFICATION:MANUAL_CLOSED - Cover closed manually",
+               "STATUS:Operation Mode:MANUAL", "STATUS:Cover Status:CLOSED"],
+    b"AUTO": ["NOTIFICATION:AUTO_MODE - Rain detection active", "STATUS:Operation Mode:AUTO"],
+    b"STATUS": ["STATUS:Arduino Connection:Connected", "STATUS:Operation Mode:AUTO",
+                "STATUS:Cover Status:OPEN", "STATUS:Rain Detection:DRY",
+                "STATUS:Confirmation Delay:5 seconds (rain stop only)"],
+}
+
+
+class StandInDevice:
+    """
+    Fake Arduino on a pseudo-terminal.
+
+    Streams rain-cycle traffic at a fixed rate, answers host commands like
+    the sketch does, and injects "SOAK:<seq>" probes every probe_every lines
+    so the harness can measure end-to-end latency through all handlers.
+    """
+    def __init__(self, rate, probe_every=50):
+        import pty
+        import tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.rate = rate
+        self.probe_every = probe_every
+        self.probes = {}
+        self.lines_sent = 0
+        self.running = False
+        self.write_lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._stream, daemon=True).start()
+        threading.Thread(target=self._answer, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _write(self, line):
+        with self.write_lock:
+            os.write(self.master, (line + "\r\n").encode())
+
+    def _stream(self):
+        interval = 1.0 / self.rate
+        next_send = time.perf_counter()
+        seq = 0
+        while self.running:
+            if self.lines_sent % self.probe_every == 0:
+                seq += 1
+                self.probes[seq] = time.perf_counter()
+                self._write(f"SOAK:{seq}")
+            else:
+                self._write(RAIN_CYCLE[self.lines_sent % len(RAIN_CYCLE)])
+            self.lines_sent += 1
+
+            next_send += interval
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _answer(self):
+        buffer = b""
+        while self.running:
+            try:
+                buffer += os.read(self.master, 256)
+            except OSError:
+                break
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.strip().upper()
+                for reply in COMMAND_REPLIES.get(command, [f"ERROR:Unknown command: {command.decode()}"]):
+                    self._write(reply)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB, or None if unavailable"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_soak(args):
+    """Run the soak test; returns a list of limit violations"""
+    device = StandInDevice(args.rate)
+    app = ClothesProtectorApp(port=device.port, headless=args.headless,
+                              schedule_db=":memory:", metrics_port=None)
+
+    probe_window = {'latencies': []}
+
+    def probe_handler(message_type, formatted_message, raw_message):
+        if raw_message.startswith("SOAK:"):
+            sent = device.probes.pop(int(raw_message[5:]), None)
+            if sent is not None:
+                probe_window['latencies'].append(time.perf_counter() - sent)
+
+    app.backend.add_message_handler(probe_handler)
+
+    tracemalloc.start(10)
+    app.start()
+    device.start()
+
+    samples = []
+    baseline_snapshot = None
+    baseline_heap = None
+    started = time.monotonic()
+    next_sample = started + args.warmup
+
+    try:
+        while time.monotonic() - started < args.duration + args.warmup:
+            if app.root:
+                app.root.update()
+                time.sleep(0.02)
+            else:
+                time.sleep(0.2)
+
+            if time.monotonic() < next_sample:
+                continue
+            next_sample += args.sample_interval
+
+            window, probe_window['latencies'] = probe_window['latencies'], []
+            heap = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)])
+            sample = {
+                'elapsed': time.monotonic() - started,
+                'rss': current_rss_mb(),
+                'heap': heap,
+                'p50': percentile(window, 0.50),
+                'p95': percentile(window, 0.95),
+                'lines': device.lines_sent,
+            }
+            samples.append(sample)
+
+            if baseline_snapshot is None:
+                baseline_snapshot, baseline_heap = snapshot, heap
+                top = []
+            else:
+                top = snapshot.compare_to(baseline_snapshot, 'lineno')[:args.top]
+
+            sim_hours = device.lines_sent / args.field_rate / 60
+            print(f"[{sample['elapsed']:7.0f}s] sim {sim_hours:7.1f}h  "
+                  f"rss {sample['rss'] or 0:7.1f} MB  heap {heap:7.2f} MB  "
+                  f"p50 {(sample['p50'] or 0) * 1000:6.1f} ms  p95 {(sample['p95'] or 0) * 1000:6.1f} ms")
+            for stat in top:
+                if stat.size_diff > 0:
+                    print(f"    +{stat.size_diff / 1024:8.1f} KB  {stat.traceback[0]}")
+    finally:
+        device.stop()
+        app.shutdown()
+        if app.root:
+            app.root.destroy()
+        tracemalloc.stop()
+
+    return check_limits(samples, baseline_heap, args)
+
+
+def check_limits(samples, baseline_heap, args):
+    """Compare first and last samples against the configured limits"""
+    if len(samples) < 2:
+        return ["not enough samples - increase --duration or lower --sample-interval"]
+
+    first, last = samples[0], samples[-1]
+    failures = []
+
+    if first['rss'] is not None and last['rss'] is not None:
+        growth = last['rss'] - first['rss']
+        if growth > args.max_rss_growth:
+            failures.append(f"RSS grew {growth:.1f} MB (limit {args.max_rss_growth} MB)")
+
+    heap_growth = last['heap'] - baseline_heap
+    if heap_growth > args.max_heap_growth:
+        failures.append(f"Traced heap grew {heap_growth:.2f} MB (limit {args.max_heap_growth} MB)")
+
+    p95s = [s['p95'] for s in samples if s['p95'] is not None]
+    if not p95s:
+        failures.append("no latency probes came back - the reader is stalled")
+    else:
+        if p95s[-1] * 1000 > args.max_latency:
+            failures.append(f"p95 latency {p95s[-1] * 1000:.1f} ms (limit {args.max_latency} ms)")
+        drift = p95s[-1] / max(p95s[0], 0.001)
+        if drift > args.max_latency_drift:
+            failures.append(f"p95 latency drifted {drift:.1f}x (limit {args.max_latency_drift}x)")
+
+    return failures
+
+
+def main():
+    """Run the soak harness from the command line"""
+    parser = argparse.ArgumentParser(
+        description="Soak-test the full app against a stand-in device on a pty (POSIX only)")
+    parser.add_argument("--duration", type=float, default=3600,
+                        help="seconds to run after warmup (default: 3600)")
+    parser.add_argument("--warmup", type=float, default=30,
+                        help="seconds before the baseline sample (default: 30)")
+    parser.add_argument("--rate", type=float, default=500,
+                        help="device lines per second (default: 500)")
+    parser.add_argument("--field-rate", type=float, default=2,
+                        help="lines per minute a real unit sends, for simulated time (default: 2)")
+    parser.add_argument("--sample-interval", type=float, default=60,
+                        help="seconds between samples (default: 60)")
+    parser.add_argument("--top", type=int, default=5,
+                        help="top allocators to show per sample (default: 5)")
+    parser.add_argument("--headless", action="store_true", help="run without the Tk window")
+    parser.add_argument("--max-rss-growth", type=float, default=20,
+                        help="allowed RSS growth in MB (default: 20)")
+    parser.add_argument("--max-heap-growth", type=float, default=10,
+                        help="allowed traced heap growth in MB (default: 10)")
+    parser.add_argument("--max-latency", type=float, default=250,
+                        help="allowed final p95 latency in ms (default: 250)")
+    parser.add_argument("--max-latency-drift", type=float, default=3,
+                        help="allowed ratio of final to first p95 latency (default: 3)")
+    args = parser.parse_args()
+
+    failures = run_soak(args)
+    if failures:
+        print("SOAK FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("SOAK PASSED")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import threading
+
+# Colours for status values the Arduino reports, precomputed so incoming
+# STATUS lines resolve to a colour with one dict lookup
+STATUS_COLORS = {
+    "OPEN": "#2ecc71",
+    "DRY": "#2ecc71",
+    "CLOSED": "#e74c3c",
+    "RAINING": "#e74c3c",
+    "MANUAL": "#f39c12",
+    "AUTO": "#3498db",
+    "Connected": "#2ecc71",
+}
+
+_MAX_CACHED_COLORS = 256
+
+
+def status_color(value):
+    """Get the display colour for a status value"""
+    color = STATUS_COLORS.get(value)
+    if color is None:
+        # Uncommon value - fall back to keyword matching, then remember it
+        if "Connected" in value:
+            color = "#2ecc71"
+        elif "AUTO" in value:
+            color = "#3498db"
+        elif "MANUAL" in value:
+            color = "#f39c12"
+        elif "CLOSED" in value or "RAINING" in value:
+            color = "#e74c3c"
+        else:
+            color = "#2ecc71"
+        if len(STATUS_COLORS) < _MAX_CACHED_COLORS:
+            STATUS_COLORS[value] = color
+    return color
+
+
+class StatusViewModel:
+    """
+    Holds the displayed value of each status field between the backend and
+    the Tk labels.
+
+    set() may be called from any thread and only records fields whose text
+    or colour actually changed. The first change schedules one flush a frame
+    later on the Tk thread, which pushes all dirty fields to the widgets, so
+    redraw cost (and Tk wakeups) follow state changes rather than message
+    volume; an idle panel schedules nothing.
+    """
+    FRAME_MS = 50
+
+    def __init__(self, root, widgets):
+        self.root = root
+        self.widgets = widgets
+        self.rendered = {field: (w.cget('text'), w.cget('fg')) for field, w in widgets.items()}
+        self.pending = {}
+        self.flush_scheduled = False
+        self.lock = threading.Lock()
+
+    def set(self, field, value, color):
+        """Record a new value for a field; no-op if it is already displayed"""
+        if field not in self.widgets:
+            return
+        state = (value, color)
+        with self.lock:
+            if self.rendered[field] == state:
+                self.pending.pop(field, None)
+                return
+            self.pending[field] = state
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+        self.root.after(self.FRAME_MS, self.flush)
+
+    def get(self, field):
+        """Get the latest (value, color) for a field, including unflushed changes"""
+        with self.lock:
+            return self.pending.get(field, self.rendered.get(field))
+
+    def flush(self):
+        """Apply all dirty fields to their widgets in one pass"""
+        with self.lock:
+            dirty, self.pending = self.pending, {}
+            self.flush_scheduled = False
+            for field, state in dirty.items():
+                self.rendered[field] = state
+        for field, (value, color) in dirty.items():
+            self.widgets[field].config(text=value, fg=color)
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import threading
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses pseudo-terminals")
+
+from fleet_runner import FleetRunner
+
+
+class FakeDevice:
+    """Pseudo-terminal that records the commands it receives"""
+    def __init__(self):
+        import pty
+        import tty
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.commands = []
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        buffer = b""
+        while True:
+            try:
+                buffer += os.read(self.master, 256)
+            except OSError:
+                return
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.strip().decode()
+                self.commands.append(command)
+                if command == "PING":
+                    os.write(self.master, b"PONG\r\n")
+
+
+def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_close_all_during_worker_restart_still_closes():
+    devices = [FakeDevice() for _ in range(2)]
+    fleet = FleetRunner([d.port for d in devices], workers=2)
+    fleet.RESTART_BACKOFF = 3600  # Hold the restart until the close is queued
+    fleet.start()
+    try:
+        assert wait_for(lambda: "PING" in devices[0].commands, 10)
+        crashed = fleet.workers[0]
+        crashed.kill()
+        crashed.join(5)
+
+        fleet.close_all()
+        assert wait_for(lambda: "CLOSE" in devices[1].commands, 5)
+        assert "CLOSE" not in devices[0].commands
+
+        fleet.RESTART_BACKOFF = 0
+        assert wait_for(lambda: "CLOSE" in devices[0].commands, 15)
+        assert wait_for(lambda: not fleet.unacked[0], 5)
+    finally:
+        fleet.stop()
@@ -0,0 +1,29 @@
+import re
+from metrics import ControllerMetrics, Counter, command_type
+
+
+def test_counter_reads_do_not_advance():
+    counter = Counter()
+    for _ in range(5):
+        counter.inc()
+    assert counter.value() == 5
+    assert counter.value() == 5
+
+
+def test_command_types_are_bounded():
+    assert command_type("CLOSE") == "CLOSE"
+    assert command_type("stream on") == "STREAM"
+    assert command_type('say "hi"\nx') == "other"
+    assert command_type("") == "other"
+
+
+def test_render_escapes_labels():
+    metrics = ControllerMetrics('C:\\dev"1\n')
+    metrics.command_sent('say "hi"\nx')
+    metrics.command_sent("STREAM ON")
+    text = metrics.render()
+    assert 'port="C:\\\\dev\\"1\\n"' in text
+    assert 'command="other"} 1' in text
+    assert 'command="STREAM"} 1' in text
+    samples = [line for line in text.splitlines() if not line.startswith("#")]
+    assert all(re.fullmatch(r'\w+\{(\w+="(\\.|[^"\\\n])*",?)+\} -?\d+', line) for line in samples)
@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from rain_buffer import RainIntensityBuffer
+
+
+def filled(count, capacity, values=None):
+    buffer = RainIntensityBuffer(capacity)
+    for i in range(count):
+        buffer.append(i / 10, 0 if values is None else values[i])
+    return buffer
+
+
+def test_newest_sample_is_drawn():
+    buffer = filled(40000, 36000)
+    buffer.append(4000.0, 1000)
+    times, lows, highs = buffer.downsample(800)
+    assert highs[-1] == 1000
+    assert np.all(np.diff(times) > 0)
+
+
+@pytest.mark.parametrize("start, end, width", [
+    (7, 49990, 300), (1000, 31003, 500), (0, 50000, 50), (3, 400, 150),
+])
+def test_downsample_matches_raw_extremes(start, end, width):
+    values = np.random.RandomState(0).randint(0, 1024, 50000)
+    buffer = filled(50000, 100000, values)
+    times, lows, highs = buffer.downsample(width, start / 10, end / 10)
+    assert len(times) <= width
+    assert times[0] == start / 10
+    assert lows.min() == values[start:end].min()
+    assert highs.max() == values[start:end].max()
+
+
+def test_small_window_is_raw():
+    buffer = filled(100, 1024, list(range(100)))
+    times, lows, highs = buffer.downsample(100)
+    assert len(times) == 100
+    assert np.array_equal(lows, highs)
+
+
+def test_timestamps_never_go_backwards():
+    buffer = RainIntensityBuffer(1024)
+    for t in (10.0, 11.0, 5.0, 12.0):
+        buffer.append(t, 1)
+    times, _, _ = buffer.samples_since(0)
+    assert times.tolist() == [10.0, 11.0, 11.0, 12.0]
@@ -0,0 +1,114 @@
+import pytest
+from rules_engine import CLOCK, RulesEngine, compile_condition
+
+
+class State:
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def get(self, field):
+        return self.fields.get(field)
+
+
+class Backend:
+    def __init__(self):
+        self.message_handlers = []
+        self.sent = []
+
+    def add_message_handler(self, handler):
+        self.message_handlers.append(handler)
+
+    def notify(self, message_type, message):
+        pass
+
+    def send_command(self, command):
+        self.sent.append(command)
+
+    def status(self, raw):
+        for handler in self.message_handlers:
+            handler("STATUS", raw, raw)
+
+
+def test_compile_condition_operators_and_fields():
+    predicate, fields = compile_condition(
+        {"all": [{"field": "cover_status", "eq": "OPEN"},
+                 {"any": [{"field": "humidity", "gt": 85},
+                          {"not": {"field": "mode", "in": ["AUTO"]}}]}]})
+    assert fields == {"cover_status", "humidity", "mode"}
+    assert predicate(State(cover_status="OPEN", humidity=90.0, mode="AUTO"))
+    assert predicate(State(cover_status="OPEN", humidity=50.0, mode="MANUAL"))
+    assert not predicate(State(cover_status="OPEN", humidity=50.0, mode="AUTO"))
+    assert not predicate(State(cover_status="CLOSED", humidity=90.0))
+
+
+def test_compile_condition_missing_or_mistyped_values_are_false():
+    predicate, _ = compile_condition({"field": "humidity", "gt": 85})
+    assert not predicate(State())
+    assert not predicate(State(humidity="n/a"))
+
+
+@pytest.mark.parametrize("condition", [
+    {"field": "humidity", "gte": 85},
+    {"field": "humidity", "gt": 85, "lt": 90},
+    {"humidity": 85},
+])
+def test_compile_condition_rejects_bad_conditions(condition):
+    with pytest.raises(ValueError):
+        compile_condition(condition)
+
+
+def test_dependency_index():
+    engine = RulesEngine([
+        {"name": "humid", "when": {"field": "humidity", "gt": 85}, "then": "CLOSE"},
+        {"name": "after rain", "when": {"field": "seconds_since_rain", "lt": 60}, "then": "CLOSE"},
+        {"name": "night", "when": {"field": "time", "ge": "19:30"}, "then": "CLOSE"},
+    ])
+    assert engine.index["humidity"] == [0]
+    assert engine.index["rain_detection"] == [1]
+    assert engine.index[CLOCK] == [1, 2]
+    assert "time" not in engine.index
+
+
+def test_rule_fires_on_edge_for_changed_field_only():
+    engine = RulesEngine([
+        {"name": "humid", "when": {"field": "humidity", "gt": 85}, "then": "CLOSE"},
+        {"name": "open", "when": {"field": "cover_status", "eq": "OPEN"}, "then": "AUTO"},
+    ])
+    backend = Backend()
+    engine.attach(backend)
+    backend.status("Humidity:90")
+    backend.status("Humidity:95")
+    assert backend.sent == ["CLOSE"]
+    backend.status("Humidity:50")
+    backend.status("Humidity:88")
+    assert backend.sent == ["CLOSE", "CLOSE"]
+    backend.status("Cover Status:OPEN")
+    assert backend.sent == ["CLOSE", "CLOSE", "AUTO"]
+
+
+def test_cooldown_delays_an_edge_instead_of_dropping_it(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("rules_engine.time.monotonic", lambda: clock[0])
+    engine = RulesEngine([
+        {"name": "humid", "when": {"field": "humidity", "gt": 85}, "then": "CLOSE", "cooldown": 60},
+    ])
+    backend = Backend()
+    engine.attach(backend)
+    backend.status("Humidity:90")
+    backend.status("Humidity:50")
+    clock[0] += 10
+    backend.status("Humidity:91")
+    assert backend.sent == ["CLOSE"]
+
+    clock[0] += 60
+    engine.tick()  # Still humid once the cooldown ends
+    assert backend.sent == ["CLOSE", "CLOSE"]
+    backend.status("Humidity:95")
+    assert backend.sent == ["CLOSE", "CLOSE"]
+
+
+def test_delay_command_validation():
+    RulesEngine([{"when": {"field": "rain_detection", "eq": "RAINING"}, "then": "DELAY 1800"}])
+    for then in ("DELAY", "DELAY soon", "CLOSE 5", "SHAKE"):
+        with pytest.raises(ValueError):
+            RulesEngine([{"when": {"field": "humidity", "gt": 85}, "then": then}])
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import pytest
+from schedule_store import ScheduleStore
+from arduino_connection import ArduinoConnection
+
+
+class FakePort:
+    is_open = True
+    in_waiting = 0
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data.decode().strip())
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScheduleStore(str(tmp_path / "schedules.db"))
+    yield store
+    store.close()
+
+
+def test_store_round_trip(store, tmp_path):
+    open_time = datetime(2026, 5, 1, 8, 0)
+    close_time = datetime(2026, 5, 1, 12, 30)
+    store.save("COM8", open_time, close_time)
+    store.save("COM9", open_time, close_time, opened=True)
+    store.mark_opened("COM8")
+    assert store.conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+
+    reopened = ScheduleStore(str(tmp_path / "schedules.db"))
+    try:
+        assert reopened.load("COM8") == {
+            'port': "COM8", 'open_time': open_time, 'close_time': close_time, 'opened': True}
+        assert set(reopened.load_all()) == {"COM8", "COM9"}
+    finally:
+        reopened.close()
+
+    store.delete("COM8")
+    assert store.load("COM8") is None
+
+
+def restored(store, open_offset, close_offset, opened=False):
+    """Restore a schedule saved relative to now; returns (backend, commands sent)"""
+    now = datetime.now()
+    store.save("COM8", now + timedelta(hours=open_offset), now + timedelta(hours=close_offset), opened)
+    backend = ArduinoConnection(port="COM8", schedule_store=store)
+    backend.arduino = FakePort()
+    backend.link_state = "UP"
+    assert backend.restore_schedule()
+    backend.check_schedule()
+    return backend, backend.arduino.written
+
+
+def test_restore_missed_close_closes_without_opening(store):
+    backend, sent = restored(store, -3, -1)
+    assert sent == ["CLOSE"]
+    assert not backend.schedule_active
+    assert store.load("COM8") is None
+    assert backend.metrics.schedule_misses.value() == 1
+
+
+def test_restore_missed_open_opens_and_closes_on_time(store):
+    backend, sent = restored(store, -1, 2)
+    assert sent == ["OPEN"]
+    assert backend.schedule_active
+    assert store.load("COM8")['opened']
+    assert backend.metrics.schedule_misses.value() == 1
+
+
+def test_restore_already_opened_is_not_reopened(store):
+    backend, sent = restored(store, -1, 2, opened=True)
+    assert sent == []
+    assert backend.metrics.schedule_misses.value() == 0
+
+
+def test_restore_future_schedule_runs_normally(store):
+    backend, sent = restored(store, 1, 3)
+    assert sent == []
+    assert backend.schedule_active
+    assert backend.metrics.schedule_misses.value() == 0
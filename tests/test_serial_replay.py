@@ -0,0 +1,50 @@
+import os
+from arduino_connection import ArduinoConnection
+from serial_replay import load_capture, replay_capture
+
+CAPTURE = os.path.join(os.path.dirname(__file__), 'data', 'rain_cycle.capture')
+
+
+def replay():
+    backend = ArduinoConnection(port='REPLAY')
+    received = []
+    backend.add_message_handler(
+        lambda message_type, formatted_message, raw_message:
+            received.append((message_type, raw_message)))
+    stats = replay_capture(backend, CAPTURE, speed=0)
+    return backend, received, stats
+
+
+def test_load_capture_keeps_offsets_and_order():
+    entries = load_capture(CAPTURE)
+    assert len(entries) == 12
+    assert entries[0] == (0.0, "SYSTEM:Rain Detector Ready - Immediate close, 5s delay on stop")
+    assert [offset for offset, _ in entries] == sorted(offset for offset, _ in entries)
+
+
+def test_replay_handler_output():
+    _, received, stats = replay()
+    assert stats['lines'] == 12
+    assert received == [
+        ("SYSTEM", "Rain Detector Ready - Immediate close, 5s delay on stop"),
+        ("STATUS", "Cover Status:OPEN"),
+        ("STATUS", "Rain Detection:DRY"),
+        ("ARDUINO", "Rain detected! Cover CLOSED immediately"),
+        ("STATUS", "Cover Status:CLOSED"),
+        ("STATUS", "Rain Detection:RAINING"),
+        ("ARDUINO", "Rain stopped! Confirming in 5 seconds..."),
+        ("ARDUINO", "CONFIRMED_DRY - Cover OPENED"),
+        ("STATUS", "Cover Status:OPEN"),
+        ("STATUS", "Rain Detection:DRY"),
+        ("INFO", "garbled ~~"),
+    ]
+
+
+def test_replay_metrics():
+    backend, _, _ = replay()
+    metrics = backend.metrics
+    assert metrics.cover_cycles.value() == 1
+    assert metrics.cover_closed.value() == 0
+    assert metrics.raining.value() == 0
+    assert metrics.parse_errors.value() == 1
+    assert metrics.handler_exceptions.value() == 0
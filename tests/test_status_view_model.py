@@ -0,0 +1,75 @@
+from status_view_model import StatusViewModel, status_color
+
+
+class FakeLabel:
+    def __init__(self, text, fg):
+        self.options = {'text': text, 'fg': fg}
+        self.configs = 0
+
+    def cget(self, option):
+        return self.options[option]
+
+    def config(self, **options):
+        self.options.update(options)
+        self.configs += 1
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def run_pending(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for callback in scheduled:
+            callback()
+
+
+def make_view():
+    root = FakeRoot()
+    labels = {"Cover Status": FakeLabel("Unknown", "#e74c3c"),
+              "Rain Detection": FakeLabel("Unknown", "#e74c3c")}
+    return root, labels, StatusViewModel(root, labels)
+
+
+def test_status_color():
+    assert status_color("OPEN") == "#2ecc71"
+    assert status_color("RAINING") == "#e74c3c"
+    assert status_color("AUTO") == "#3498db"
+    assert status_color("Connected (rtt 12 ms)") == "#2ecc71"
+    assert status_color("MANUAL override") == "#f39c12"
+    assert status_color("something else") == "#2ecc71"
+
+
+def test_unchanged_value_schedules_nothing():
+    root, labels, view = make_view()
+    view.set("Cover Status", "Unknown", "#e74c3c")
+    view.set("Not a field", "OPEN", "#2ecc71")
+    assert root.scheduled == []
+
+
+def test_changes_coalesce_into_one_flush():
+    root, labels, view = make_view()
+    view.set("Cover Status", "OPEN", "#2ecc71")
+    view.set("Cover Status", "CLOSED", "#e74c3c")
+    view.set("Rain Detection", "RAINING", "#e74c3c")
+    assert len(root.scheduled) == 1
+    assert view.get("Cover Status") == ("CLOSED", "#e74c3c")
+
+    root.run_pending()
+    assert labels["Cover Status"].options == {'text': "CLOSED", 'fg': "#e74c3c"}
+    assert labels["Cover Status"].configs == 1
+    assert labels["Rain Detection"].configs == 1
+
+    view.set("Cover Status", "CLOSED", "#e74c3c")
+    assert root.scheduled == []
+
+
+def test_change_reverted_before_flush_is_not_drawn():
+    root, labels, view = make_view()
+    view.set("Cover Status", "OPEN", "#2ecc71")
+    view.set("Cover Status", "Unknown", "#e74c3c")
+    root.run_pending()
+    assert labels["Cover Status"].configs == 0